@@ -307,6 +307,7 @@ class FbPokerGame(PokerGame):
     'Player Went All-In': lambda player_id, player_name, player_money: player_name + ' went all-in with ' + str(player_money),
     'Declare Unfinished Winner': lambda winner_id, winner_name, won: winner_name + ' won ' + str(won),
     'Public Show Cards': lambda player_id, player_name, player_cards: player_name + ' has ' + FbPokerGame.style_cards(player_cards),
+    'All-In Equity': lambda player_id, player_name, turn_name, equity: player_name + ' has ' + format(equity, '.1%') + ' equity before the ' + {'PRE-FLOP': 'flop', 'FLOP': 'turn', 'TURN': 'river'}[turn_name],
     'Declare Finished Winner': lambda winner_id, winner_name, won, hand_name, hand_base, kicker: winner_name + ' won ' + str(won) + ' with ' +
      FbPokerGame.hand_repr(hand_name, hand_base, VALUES, SUITS) + ''.join([', ' + FbPokerGame.style_cards(kicker, True) + ' kicker' if kicker else '']),
     'Player Lost Money': lambda player_id, player_name: player_name + ' has been removed from the game'
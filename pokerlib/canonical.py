@@ -0,0 +1,90 @@
+VALUECHARS = '23456789TJQKA'
+
+# suits are renamed by their signature (the values a suit has in hand
+# and on the table), which does not depend on the suits' names, so all
+# suit permutations of a situation map to the same canonical form.
+# Suits with equal signatures are interchangeable, so their order
+# among themselves does not change the result
+def canonicalForm(hand, table=()):
+    signatures = [(
+        sorted((value for value, suit in hand if suit == s), reverse=True),
+        sorted((value for value, suit in table if suit == s), reverse=True)
+    ) for s in range(4)]
+    order = sorted(range(4), key=lambda s: signatures[s], reverse=True)
+
+    rename = [0] * 4
+    for new, s in enumerate(order): rename[s] = new
+    return (
+        tuple(sorted(((int(value), rename[suit]) for value, suit in hand), reverse=True)),
+        tuple(sorted(((int(value), rename[suit]) for value, suit in table), reverse=True))
+    )
+
+# name of the preflop class of two hole cards (e.g. AA, AKs, T9o)
+def handClass(hand):
+    (high, highsuit), (low, lowsuit) = sorted(hand, reverse=True)
+    name = VALUECHARS[high] + VALUECHARS[low]
+    if high == low: return name
+    return name + ('s' if highsuit == lowsuit else 'o')
+
+# the 169 preflop classes, from AA down to 32o
+HANDCLASSES = [
+    VALUECHARS[high] + VALUECHARS[low] + kind
+    for high in reversed(range(13)) for low in reversed(range(high + 1))
+    for kind in ([''] if high == low else ['s', 'o'])
+]
+HANDCLASSINDEX = {name: i for i, name in enumerate(HANDCLASSES)}
+
+SUITCHARS = 'scdh' # in the order of enums.Suit
+
+# card codes of the hands in a class, each as (higher code, lower code)
+def classCombos(name):
+    high, low = VALUECHARS.index(name[0]), VALUECHARS.index(name[1])
+    kinds = name[2:] or ('' if high == low else 'so')
+    combos = []
+    for s1 in range(4):
+        for s2 in range(4):
+            if high == low and s2 <= s1: continue
+            if s1 == s2 and 's' not in kinds: continue
+            if s1 != s2 and high != low and 'o' not in kinds: continue
+            combos.append(tuple(sorted((s1 * 13 + high, s2 * 13 + low), reverse=True)))
+    return combos
+
+# names of the classes a range token stands for, tokens can be
+# a class (AA, AKs, AKo, AK), a class with + (TT+ is TT up to AA,
+# ATs+ is ATs up to AKs) or a span of classes (99-66, KTs-K7s)
+def tokenClasses(token):
+    if token.endswith('+'):
+        name = token[:-1]
+        high, low = VALUECHARS.index(name[0]), VALUECHARS.index(name[1])
+        if high == low:
+            return [VALUECHARS[v] * 2 for v in range(high, 13)]
+        return [name[0] + VALUECHARS[v] + name[2:] for v in range(low, high)]
+    if '-' in token:
+        first, last = token.split('-')
+        if first[0] == first[1]:
+            values = range(VALUECHARS.index(last[0]), VALUECHARS.index(first[0]) + 1)
+            return [VALUECHARS[v] * 2 for v in values]
+        values = range(VALUECHARS.index(last[1]), VALUECHARS.index(first[1]) + 1)
+        return [first[0] + VALUECHARS[v] + first[2:] for v in values]
+    return [token]
+
+# parses a range like "AKs, TT+, 76s:0.5, AhKh" into a dictionary
+# of hands (pairs of card codes, higher first) and their weights,
+# a weight given after a colon applies to all hands of the token
+def parseRange(text):
+    combos = {}
+    for token in text.replace(' ', '').split(','):
+        if not token: continue
+        token, _, weight = token.partition(':')
+        weight = float(weight) if weight else 1.0
+        if len(token) == 4 and token[1] in SUITCHARS:
+            hand = [SUITCHARS.index(token[i+1]) * 13 + VALUECHARS.index(token[i])
+                    for i in (0, 2)]
+            if hand[0] == hand[1]: raise ValueError(f"invalid hand {token}")
+            combos[tuple(sorted(hand, reverse=True))] = weight
+            continue
+        for name in tokenClasses(token):
+            if name not in HANDCLASSINDEX and name + 's' not in HANDCLASSINDEX:
+                raise ValueError(f"invalid range token {token}")
+            for combo in classCombos(name): combos[combo] = weight
+    return combos
@@ -0,0 +1,79 @@
+import random
+from pokerlib.handeval import cardCode, codeCard
+
+# Set of cards stored as a 52-bit integer, where card [value, suit]
+# is the bit at its handeval card code (suit * 13 + value).
+# It is immutable, operations return new sets, iterating it
+# gives card codes from the lowest to the highest.
+class CardSet(int):
+    __slots__ = ()
+    FULL = (1 << 52) - 1
+
+    @classmethod
+    def fromCards(cls, cards):
+        mask = 0
+        for card in cards: mask |= 1 << cardCode(card)
+        return cls(mask)
+
+    @classmethod
+    def fromCodes(cls, codes):
+        mask = 0
+        for code in codes: mask |= 1 << code
+        return cls(mask)
+
+    def toCards(self):
+        return [codeCard(code) for code in self]
+
+    def __repr__(self):
+        return f"CardSet({self.toCards()})"
+
+    def __iter__(self):
+        mask = int(self)
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def __len__(self):
+        return int(self).bit_count()
+
+    # card can be given as [value, suit] or as a card code
+    def __contains__(self, card):
+        code = card if isinstance(card, int) else cardCode(card)
+        return bool(self >> code & 1)
+
+    def __or__(self, other):
+        return CardSet(int(self) | other)
+
+    def __and__(self, other):
+        return CardSet(int(self) & other)
+
+    def __sub__(self, other):
+        return CardSet(int(self) & ~other)
+
+    def add(self, card):
+        return self | 1 << (card if isinstance(card, int) else cardCode(card))
+
+    def remove(self, card):
+        return self - (1 << (card if isinstance(card, int) else cardCode(card)))
+
+    # n distinct random card codes from the set (which stays the same),
+    # rng can be any object with random() and sample() like random.Random
+    def sample(self, n, rng=random):
+        # drawing random codes and rejecting those not in the set
+        # is quicker than listing the set when most cards are in it
+        if 2 * n > len(self):
+            return rng.sample(list(self), n)
+
+        codes, taken, randfloat = [], int(self), rng.random
+        while len(codes) < n:
+            code = int(randfloat() * 52)
+            if taken >> code & 1:
+                taken ^= 1 << code
+                codes.append(code)
+        return codes
+
+    # returns n random card codes and the set without them
+    def deal(self, n, rng=random):
+        codes = self.sample(n, rng)
+        return codes, self - CardSet.fromCodes(codes)
@@ -1,31 +1,126 @@
-from itertools import cycle
-from copy import copy as shallowcopy
-try: from numpy.random import shuffle # numpy is faster (fcourse)
-except ModuleNotFoundError as e: from random import shuffle
+import random
+from bisect import bisect_left, bisect_right
 from pokerlib.enums import Value, Suit, Hand
-from pokerlib.handparser import HandParser
+from pokerlib.cardset import CardSet
+from pokerlib.handparser import HandParser, OmahaHandParser
+from pokerlib import handeval
 
 # this was just needed constantly within PokerGame
 TABLE_DICT = {0: 0, 3: 1, 4: 2, 5: 3}
 
-# Wrapper around a list of Player objects
+# Wrapper around a list of Player objects, the seats of the table
 # (used onlly for getting info, not setting;
 # PokerGame is used for manipulating/setting data to players)
-# type(self) is used if this class should be baseclassed
+# type(self) is used if this class should be baseclassed.
+# Players are indexed by id (and lazily by any other attribute looked
+# up with group[attr, value], which should not change while seated),
+# the indexes are rebuilt whenever the list changes. A round's group
+# tracks its active and not folded seats, so folding and going all in
+# have to go through fold() and all_in() while it is tracked
 class PlayerGroup(list):
 
     def __init__(self, players: list):
         # every player in list has to be an object
         # derived from Player class (or its baseclass)
-        assert all([isinstance(player, Player) for player in self])
         super().__init__(players)
+        assert all([isinstance(player, Player) for player in self])
+        self.tracked = False
+        self.reindex()
+
+    def reindex(self):
+        # the version tells others (like PokerGame.all_players) that seats changed
+        self.version = getattr(self, 'version', 0) + 1
+        self.seats = {player.id: i for i, player in enumerate(self)}
+        self.attr_indexes = {}
+        if self.tracked: self.track_states()
+
+    # keeps sorted seat lists of active and not folded players,
+    # which have to be reset by calling this again if player states
+    # are changed other than through fold() and all_in()
+    def track_states(self):
+        self.tracked = True
+        self.active_seats = [i for i, player in enumerate(self) if player.is_active()]
+        self.not_folded_seats = [i for i, player in enumerate(self) if not player.is_folded]
+
+    def fold(self, player):
+        player.is_folded = True
+        if self.tracked:
+            seat = self.seats[player.id]
+            for seats in (self.active_seats, self.not_folded_seats):
+                i = bisect_left(seats, seat)
+                if i < len(seats) and seats[i] == seat: del seats[i]
+
+    def all_in(self, player):
+        player.is_all_in = True
+        if self.tracked:
+            seat = self.seats[player.id]
+            i = bisect_left(self.active_seats, seat)
+            if i < len(self.active_seats) and self.active_seats[i] == seat:
+                del self.active_seats[i]
+
+    # list methods that change the seats
+    def append(self, player):
+        super().append(player)
+        self.reindex()
+
+    def insert(self, i, player):
+        super().insert(i, player)
+        self.reindex()
+
+    def extend(self, players):
+        super().extend(players)
+        self.reindex()
+
+    def remove(self, player):
+        super().pop(self.index(player))
+        self.reindex()
+
+    def pop(self, i=-1):
+        player = super().pop(i)
+        self.reindex()
+        return player
+
+    def clear(self):
+        super().clear()
+        self.reindex()
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self.reindex()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.reindex()
+
+    def reverse(self):
+        super().reverse()
+        self.reindex()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __contains__(self, player):
+        return getattr(player, 'id', None) in self.seats
+
+    def index(self, player, *args):
+        if player.id not in self.seats: raise ValueError(f"{player!r} is not in list")
+        return self.seats[player.id]
 
     def __getitem__(self, i):
         if isinstance(i, tuple) and len(i) == 2:
             attr, value = i
-            for player in self:
-                if player.__getattribute__(attr) == value:
-                    return player
+            if attr == 'id':
+                seat = self.seats.get(value)
+                return None if seat is None else super().__getitem__(seat)
+            if attr not in self.attr_indexes:
+                index = self.attr_indexes[attr] = {}
+                for player in self: index.setdefault(getattr(player, attr), player)
+            return self.attr_indexes[attr].get(value)
         else:
             _return = super().__getitem__(i)
             if isinstance(_return, list):
@@ -34,35 +129,51 @@ class PlayerGroup(list):
                 return _return
 
     def __add__(self, other):
-        added = super().__add__(other)
-        _return = []
-        for pl in added:
-            if pl not in _return:
+        _return = list(self)
+        for pl in other:
+            if pl.id not in self.seats:
                 _return.append(pl)
         return type(self)(_return)
 
+    def active_seats_list(self):
+        if self.tracked: return self.active_seats
+        return [i for i, player in enumerate(self) if player.is_active()]
+
+    def not_folded_seats_list(self):
+        if self.tracked: return self.not_folded_seats
+        return [i for i, player in enumerate(self) if not player.is_folded]
+
+    def count_active(self):
+        return len(self.active_seats_list())
+
+    def count_not_folded(self):
+        return len(self.not_folded_seats_list())
+
+    # the first active player seated after index_player (who can be
+    # the player itself, if it is the only active one)
     def next_active_player_from(self, index_player):
-        assert len(self.get_active_players()) >= 1
-        cyc = cycle(self)
-        for player in cyc:
-            if player == index_player:
-                break
-        for player in cyc:
-            if player.is_active():
-                return player
+        active = self.active_seats_list()
+        assert len(active) >= 1
+        i = bisect_right(active, self.seats[index_player.id])
+        return super().__getitem__(active[i % len(active)])
 
     def previous_active_player_from(self, index_player):
-        return self[::-1].next_active_player_from(index_player)
+        active = self.active_seats_list()
+        assert len(active) >= 1
+        i = bisect_left(active, self.seats[index_player.id])
+        return super().__getitem__(active[i - 1])
 
     def get_active_players(self):
-        return type(self)([player for player in self if player.is_active()])
+        return type(self)([super(PlayerGroup, self).__getitem__(i)
+                           for i in self.active_seats_list()])
 
     def get_not_folded_players(self):
-        return type(self)([player for player in self if not player.is_folded])
+        return type(self)([super(PlayerGroup, self).__getitem__(i)
+                           for i in self.not_folded_seats_list()])
 
     def all_played_turn(self):
-        for player in self:
-            if not player.played_turn and player.is_active():
+        for i in self.active_seats_list():
+            if not super().__getitem__(i).played_turn:
                 return False
         return True
 
@@ -137,12 +248,18 @@ class PokerGame:
     'Player Went All-In': lambda player_id, player_name, player_money: None,
     'Declare Unfinished Winner': lambda winner_id, winner_name, won: None,
     'Public Show Cards': lambda player_id, player_name, player_cards: None,
+    'All-In Equity': lambda player_id, player_name, turn_name, equity: None,
     'Declare Finished Winner': lambda winner_id, winner_name, won, hand_name, hand_base, kicker: None,
     'Player Lost Money': lambda player_id, player_name: None}
+    # whether All-In Equity is sent to public_out (the runouts are
+    # evaluated for it, which can be slow for many omaha players)
+    all_in_equities = True
 
-    # accepts PlayerGroup as players and big_blinds
-    def __init__(self, players: PlayerGroup, big_blind: int):
+    # accepts PlayerGroup as players and big_blinds, hand_parser
+    # defines the variant played (HandParser or OmahaHandParser)
+    def __init__(self, players: PlayerGroup, big_blind: int, hand_parser=HandParser):
         self.big_blind = big_blind
+        self.hand_parser = hand_parser
         self.players = players # players playing the current round
         self.round = None
         self.rounds_played = 0
@@ -150,10 +267,28 @@ class PokerGame:
         # changes during game, resets every round
         # player that posts big blind (starts with the first one)
         self.button = players[0] if players else None
+        self.all_players_key = self.all_players_group = None
 
+        # public_out and private_out are only called (and their arguments
+        # built) if a subclass overrides them, so games without IO
+        # (as in pokerlib.headless) don't pay for the events
+        self.public_listener = type(self).public_out is not PokerGame.public_out
+        self.private_listener = type(self).private_out is not PokerGame.private_out
+
+        # the game's own generator the cards are drawn with,
+        # it can be seeded without touching the global one
+        self.rng = random.Random()
+
+    # merged group of the game's and the round's players,
+    # only rebuilt when one of them changes
     @property
     def all_players(self):
-        return self.players if not self.round else self.players + self.round.players
+        if not self.round: return self.players
+        key = (self.round, self.players.version, self.round.players.version)
+        if self.all_players_key != key:
+            self.all_players_key = key
+            self.all_players_group = self.players + self.round.players
+        return self.all_players_group
 
     def on_player_join(self, player):
         if player.money > 0: # safety
@@ -165,13 +300,13 @@ class PokerGame:
     def on_player_leave(self, player):
         # if round is being played and if player is playing in it (all_ins bugs)
         if self.round and player in self.round.players and player.is_active():
-            self.public_out(player.name + "'s Hand is Folded")
+            if self.public_listener: self.public_out(player.name + "'s Hand is Folded")
             if player == self.round.current_player:
                 self.round.process_action(player, 'fold')
                 self.round.process_after_input()
             elif player.is_active():
-                player.is_folded = True
-                if len(self.round.players.get_not_folded_players()) == 1:
+                self.round.fold(player)
+                if self.round.players.count_not_folded() == 1:
                     self.round.process_action(self.round.current_player, 'call')
                     self.round.process_after_input()
         if player in self.players:
@@ -186,22 +321,21 @@ class PokerGame:
         assert self.round is None and self.is_ok()
 
         self.rounds_played += 1
-        self.public_out(round_index = self.rounds_played, _id = 'New Round')
+        if self.public_listener: self.public_out(round_index = self.rounds_played, _id = 'New Round')
         # set the next player that will be the button
         self.button = self.players[(self.players.index(self.button) + 1) % len(self.players)]
-        self.round = self.Round(type(self.players)(self.players), self.button, self)
-
-        # this happens if during the self.round attribute setting the game closes,
-        # so this.round sets itself to None, but because this
-        # is during its attribute setting it is still defined as round
-        if not self.is_ok(): self.round = None
+        # the round sets itself as self.round before posting blinds, as it
+        # can close (and start the next round) before it is constructed
+        self.Round(type(self.players)(self.players), self.button, self)
 
     class Round:
+        # indexed by card codes of CardSet
         __deck = [[value, suit] for suit in Suit for value in Value]
 
         def __init__(this, players, button, game_ref):
             # reference from this to self. Has to stay, because of public out
             this.self = game_ref
+            this.self.round = this
             # a sign that can be toggled from an outside source signaling
             # that round will end after the current round is finished
             this.exit_after_this = False
@@ -211,6 +345,14 @@ class PokerGame:
 
             this.table = []
             this.deck = this.deck_generator()
+            # betting state kept up to date by player_added_to_pot and fold:
+            # the turn index (TABLE_DICT[len(this.table)]), money put in
+            # the pot on every turn, the highest money given this turn by
+            # anyone and by players who have not folded, and the number
+            # of active players that have given less than the latter
+            this.turn_index = 0
+            this.pot = [0, 0, 0, 0]
+            this.to_match = this.stake_to_match = this.owing = 0
             this.turn_gen = this.turn_generator()
 
             this.current_player = this.button
@@ -222,35 +364,50 @@ class PokerGame:
                 player.played_turn = False
 
                 assert player.money > 0
-                player.cards = tuple(next(this.deck) for _ in range(2))
-                player.hand = HandParser(list(player.cards))
-                this.self.private_out(
-                    player,
-                    cards = player.cards,
-                    _id = 'Dealt Cards'
-                )
+                player.cards = tuple(next(this.deck) for _ in
+                                     range(this.self.hand_parser.holecards))
+                player.hand = this.self.hand_parser(list(player.cards))
+                if this.self.private_listener:
+                    this.self.private_out(
+                        player,
+                        cards = player.cards,
+                        _id = 'Dealt Cards'
+                    )
 
+            this.players.track_states()
             previous_player = this.players.previous_active_player_from(this.button)
             this.player_added_to_pot(previous_player, this.self.big_blind // 2)
-            this.self.public_out(
-                player_id = previous_player.id,
-                player_name = previous_player.name,
-                given = previous_player.money_given[0],
-                _id = 'Small Blind'
-            )
+            if this.self.public_listener:
+                this.self.public_out(
+                    player_id = previous_player.id,
+                    player_name = previous_player.name,
+                    given = previous_player.money_given[0],
+                    _id = 'Small Blind'
+                )
             this.player_added_to_pot(this.button, this.self.big_blind)
-            this.self.public_out(
-                player_id = this.button.id,
-                player_name = this.button.name,
-                given = this.button.money_given[0],
-                _id = 'Big Blind'
-            )
+            if this.self.public_listener:
+                this.self.public_out(
+                    player_id = this.button.id,
+                    player_name = this.button.name,
+                    given = this.button.money_given[0],
+                    _id = 'Big Blind'
+                )
 
             this.process_after_input()
 
         # deletes itself from game attributes, resets everything and
         # returns whether the game should be continued
         def close(this):
+            # if the button lost all money, it moves back to the closest
+            # player that stays in the game, so new_round can move it on
+            seats, button = this.self.players, this.self.button
+            if button in seats and button.money == 0:
+                i = seats.index(button)
+                for j in range(1, len(seats)):
+                    if seats[i - j].money > 0:
+                        this.self.button = seats[i - j]
+                        break
+
             for player in this.players:
                 player.money_given = [0, 0, 0, 0]
                 player.is_folded = False
@@ -260,11 +417,12 @@ class PokerGame:
                 player.hand = None
                 if player.money == 0:
                     this.self.players.remove(player)
-                    this.self.public_out(
-                        player_name = player.name,
-                        player_id = player.id,
-                        _id = 'Player Lost Money'
-                    )
+                    if this.self.public_listener:
+                        this.self.public_out(
+                            player_name = player.name,
+                            player_id = player.id,
+                            _id = 'Player Lost Money'
+                        )
 
             # if game wasnt scheduled to end after this round from an
             # external source and game is ok to continue,
@@ -273,36 +431,52 @@ class PokerGame:
             if not this.exit_after_this and this.self.is_ok():
                 this.self.new_round()
 
-        # returns a shuffled deck generator
+        # a generator of cards drawn randomly from the deck with the
+        # game's rng (only the cards that get dealt are ever drawn)
         def deck_generator(this):
-            deck = shallowcopy(this.__deck)
-            shuffle(deck)
-            return (card for card in deck) # returns a generator
+            deck = CardSet(CardSet.FULL)
+            while deck:
+                (code,), deck = deck.deal(1, this.self.rng)
+                yield this.__deck[code]
 
         # money other players have to call (or go all_in) to continiue to the next turn
         def get_money_to_call(this):
-            return max(player.money_given[TABLE_DICT[len(this.table)]] for player in this.players)
+            return this.to_match
 
         # returns [a,b,c,d] for pot invested on every turn during round
         # (for pre-flop, flop, turn, river)
         def get_pot_size(this):
-            return [sum(player.money_given[i] for player in this.players) for i in range(4)]
+            return list(this.pot)
 
         # this is used to see whether round can continue to another turn
         # checks if all active players have given equal amount of money,
         # and those that have gone all in have less money in that those who are active
+        # (that is no active player has given less than the highest stake)
         def pot_is_equal(this):
-            # so max returns 0 or max money_given
-            all_ins_money = [player.money_given[TABLE_DICT[len(this.table)]] \
-            for player in this.players if player.is_all_in and not player.is_folded] or [0]
-            # so the second boolean expression works
-            active_money = [player.money_given[TABLE_DICT[len(this.table)]] \
-            for player in this.players if player.is_active()] or [float('Inf')]
-            return len(set(active_money)) == 1 and active_money[0] >= max(all_ins_money)
+            return this.owing == 0
+
+        # recounts the highest stake of players who have not folded
+        # and how many active players have given less than it
+        def count_owing(this):
+            given = [player.money_given[this.turn_index] for player in this.players
+                     if not player.is_folded]
+            this.stake_to_match = max(given, default=0)
+            this.owing = sum(1 for player in this.players if player.is_active()
+                             and player.money_given[this.turn_index] < this.stake_to_match)
+
+        # folds player out of the round, the highest stake is only
+        # recounted if it might have been player's
+        def fold(this, player):
+            given = player.money_given[this.turn_index]
+            if player.is_active() and given < this.stake_to_match: this.owing -= 1
+            this.players.fold(player)
+            if given == this.stake_to_match: this.count_owing()
 
         # this is called whenever player puts money in the pot and processes whether he went all-in
         def player_added_to_pot(this, player, money):
-            turn_index = TABLE_DICT[len(this.table)]
+            turn_index = this.turn_index
+            given = player.money_given[turn_index]
+            owed = player.is_active() and given < this.stake_to_match
 
             if 0 <= money < player.money:
                 player.money -= money # subtract player's money
@@ -310,15 +484,26 @@ class PokerGame:
 
             # if player raises more than he has it is considered as going all in
             else:
-                this.self.public_out(
-                    player_id = player.id,
-                    player_name = player.name,
-                    player_money = player.money,
-                    _id = 'Player Went All-In'
-                )
+                if this.self.public_listener:
+                    this.self.public_out(
+                        player_id = player.id,
+                        player_name = player.name,
+                        player_money = player.money,
+                        _id = 'Player Went All-In'
+                    )
                 player.money_given[turn_index] += player.money
                 player.money = 0
-                player.is_all_in = True
+                this.players.all_in(player)
+
+            this.pot[turn_index] += player.money_given[turn_index] - given
+            given = player.money_given[turn_index]
+            this.to_match = max(this.to_match, given)
+            # everyone else active has given less if player raised the stake
+            if given > this.stake_to_match:
+                this.stake_to_match = given
+                this.owing = this.players.count_active() - player.is_active()
+            else:
+                this.owing += (player.is_active() and given < this.stake_to_match) - owed
 
         # process raise, call or fold and return true or false whether input is valid
         # blinds is set to True only when function is called from Round __init__
@@ -327,8 +512,8 @@ class PokerGame:
             if not (action in ['call', 'check', 'fold', 'all in'] or action.startswith('raise ')): # safety
                 return False
 
-            turn_index = TABLE_DICT[len(this.table)]
-            money_to_call = this.get_money_to_call()
+            turn_index = this.turn_index
+            money_to_call = this.to_match
             money_left_to_call = money_to_call - this.current_player.money_given[turn_index]
 
             # process RAISE (input has to be "raise X", where X is a non
@@ -340,14 +525,15 @@ class PokerGame:
                 if raised_by + money_to_call < this.current_player.money:
                     # if player didnt go all-in he should raise more than the BIG_BLIND
                     if raised_by < this.self.big_blind:
-                        this.self.public_out(_id = 'Raise Amount Error')
+                        if this.self.public_listener: this.self.public_out(_id = 'Raise Amount Error')
                         return False
-                    this.self.public_out(
-                        player_id = this.current_player.id,
-                        player_name = this.current_player.name,
-                        raised = raised_by,
-                        _id = 'Player Raised'
-                    )
+                    if this.self.public_listener:
+                        this.self.public_out(
+                            player_id = this.current_player.id,
+                            player_name = this.current_player.name,
+                            raised = raised_by,
+                            _id = 'Player Raised'
+                        )
 
                 this.player_added_to_pot(this.current_player, money_left_to_call + raised_by)
                 this.current_player.played_turn = True
@@ -365,12 +551,13 @@ class PokerGame:
                 call_value = money_left_to_call \
                     if money_left_to_call < this.current_player.money \
                     else this.current_player.money
-                this.self.public_out(
-                    player_id = this.current_player.id,
-                    player_name = this.current_player.name,
-                    called = call_value ,
-                    _id = 'Player Called'
-                )
+                if this.self.public_listener:
+                    this.self.public_out(
+                        player_id = this.current_player.id,
+                        player_name = this.current_player.name,
+                        called = call_value ,
+                        _id = 'Player Called'
+                    )
                 this.player_added_to_pot(this.current_player, money_left_to_call)
                 this.current_player.played_turn = True
                 this.process_after_input()
@@ -379,23 +566,25 @@ class PokerGame:
             # process check if there is no money to call
             # (same as call only for instances when you call 0)
             elif action == 'check' and money_left_to_call == 0:
-                this.self.public_out(
-                    player_id = this.current_player.id,
-                    player_name = this.current_player.name,
-                    _id = 'Player Checked'
-                )
+                if this.self.public_listener:
+                    this.self.public_out(
+                        player_id = this.current_player.id,
+                        player_name = this.current_player.name,
+                        _id = 'Player Checked'
+                    )
                 this.current_player.played_turn = True
                 this.process_after_input()
                 return True
 
             # process FOLD
             elif action == 'fold':
-                this.self.public_out(
-                    player_id = this.current_player.id,
-                    player_name = this.current_player.name,
-                    _id = 'Player Folded'
-                )
-                this.current_player.is_folded = True
+                if this.self.public_listener:
+                    this.self.public_out(
+                        player_id = this.current_player.id,
+                        player_name = this.current_player.name,
+                        _id = 'Player Folded'
+                    )
+                this.fold(this.current_player)
                 this.current_player.played_turn = True
                 this.process_after_input()
                 return True
@@ -405,35 +594,43 @@ class PokerGame:
 
         # resets played_turn and money_in_pot for every player.
         # Initializes new turn based how many cards were on the table
+        # new cards are summed up once and added only to hands that
+        # are still in the game, which are evaluated at showdown
         def turn_generator(this):
             for i, turn in zip((3, 1, 1), ('FLOP', 'TURN', 'RIVER')):
                 new_cards = [next(this.deck) for _ in range(i)]
+                new_key = handeval.cardsKey(map(handeval.cardCode, new_cards))
                 for player in this.players:
                     player.played_turn = False
-                    player.hand.addCards(new_cards)
-                    player.hand.parse()
+                    if not player.is_folded:
+                        player.hand.addCards(new_cards, new_key)
 
                 this.table.extend(new_cards)
-                this.self.public_out(
-                    turn_name = turn,
-                    table = this.table,
-                    _id = 'New Turn'
-                )
+                this.turn_index += 1
+                this.to_match = this.stake_to_match = this.owing = 0
+                if this.self.public_listener:
+                    this.self.public_out(
+                        turn_name = turn,
+                        table = this.table,
+                        _id = 'New Turn'
+                    )
                 yield True
 
         # This continues the game and is called with player input
         def process_after_input(this):
             # player won, round is over
-            if len(this.players.get_not_folded_players()) <= 1:
+            if this.players.count_not_folded() <= 1:
                 this.deal_winnings()
                 return this.close()
 
             # if everyone or everyone but one went all in and there
             # is more than one player who hasnt folded input stage is over
-            if len(this.players.get_active_players()) <= 1 and this.pot_is_equal() \
-            and len(this.players.get_not_folded_players()) >= 2:
+            if this.players.count_active() <= 1 and this.pot_is_equal() \
+            and this.players.count_not_folded() >= 2:
                 # user input not needed, so turns continue within this same function
-                for _ in range(3 - TABLE_DICT[len(this.table)]):
+                for _ in range(3 - this.turn_index):
+                    if this.self.public_listener and this.self.all_in_equities:
+                        this.show_equities()
                     next(this.turn_gen)
                 this.deal_winnings()
                 return this.close()
@@ -450,101 +647,130 @@ class PokerGame:
                     next(this.turn_gen)
 
             this.current_player = this.players.next_active_player_from(this.current_player)
-            to_call = this.get_money_to_call() - this.current_player.money_given[TABLE_DICT[len(this.table)]]
-            this.self.public_out(
-                player_name = this.current_player.name,
-                player_id = this.current_player.id,
-                to_call = to_call, _id = 'To Call'
+            to_call = this.to_match - this.current_player.money_given[this.turn_index]
+            if this.self.public_listener:
+                this.self.public_out(
+                    player_name = this.current_player.name,
+                    player_id = this.current_player.id,
+                    to_call = to_call, _id = 'To Call'
+                )
+
+        # equity of every player left in an all-in runout before
+        # the next cards are dealt, as handstats.runoutEquities gives it
+        # (it is skipped if there are too many omaha runouts),
+        # handstats is only imported by games that show equities
+        def show_equities(this):
+            from pokerlib.handstats import runoutEquities
+            competitors = this.players.get_not_folded_players()
+            equities = runoutEquities(
+                [list(map(handeval.cardCode, player.cards)) for player in competitors],
+                this.table, omaha = issubclass(this.self.hand_parser, OmahaHandParser)
             )
+            if equities is None: return
+            for player, equity in zip(competitors, equities):
+                this.self.public_out(
+                    player_id = player.id,
+                    player_name = player.name,
+                    turn_name = ['PRE-FLOP', 'FLOP', 'TURN'][this.turn_index],
+                    equity = equity,
+                    _id = 'All-In Equity'
+                )
 
         def deal_winnings(this):
             # if all players leave (safety)
-            if len(this.players.get_not_folded_players()) == 0: return
+            if this.players.count_not_folded() == 0: return
             # if there is one player who has not folded he gets everything
-            if len(this.players.get_not_folded_players()) == 1:
+            if this.players.count_not_folded() == 1:
                 winner = this.players.get_not_folded_players()[0]
                 winner.money += sum(this.get_pot_size())
-                this.self.public_out(
-                    winner_id = winner.id,
-                    winner_name = winner.name,
-                    won = sum(this.get_pot_size()),
-                    _id = 'Declare Unfinished Winner'
-                )
+                if this.self.public_listener:
+                    this.self.public_out(
+                        winner_id = winner.id,
+                        winner_name = winner.name,
+                        won = sum(this.get_pot_size()),
+                        _id = 'Declare Unfinished Winner'
+                    )
                 return
 
-            for player in this.players: player.stake = sum(player.money_given)
-            # arranges players who have gone all in by their pot
-            # contribution size (from smallest to largest)
-            # player can be all in and folded if he
+            # players who went all in, from the smallest to the largest stake
+            # in the pot, and then the rest who have not folded, which is the
+            # order hands are shown in. Player can be all in and folded if he
             # left after going all in and had status is_folded set from outside
             # the round instance
-            all_ins_sorted = sorted([player for player in this.players
+            stakes = {player.id: sum(player.money_given) for player in this.players}
+            showdown = sorted([player for player in this.players
                 if player.is_all_in and not player.is_folded],
-                key = lambda x: sum(x.money_given))
-            not_all_in_active = [player for player in this.players
-                                 if not (player.is_all_in or player.is_folded)]
-            # players from smallest to largest stake in pot
-            # (not all_in's stake doesnt matter as long as they are last)
-            # subgame means the players who are included in the competition
-            # for their bought part of the pot
-            sorted_by_subgames = type(this.players)(all_ins_sorted + not_all_in_active)
-            # players grouped by their pot contribution (indexes in sorted_by_subgames list)
-            grouped_indexes = [0] + [i for i in range(1, len(sorted_by_subgames))
-                if sorted_by_subgames[i - 1].stake < sorted_by_subgames[i].stake]
+                key = lambda x: stakes[x.id])
+            showdown += [player for player in this.players
+                         if not (player.is_all_in or player.is_folded)]
 
             # show players' hands
-            for competitor in sorted_by_subgames:
-                this.self.public_out(
-                    player_id = competitor.id,
-                    player_name = competitor.name,
-                    player_cards = competitor.cards,
-                    _id = 'Public Show Cards'
-                )
+            for competitor in showdown:
+                if this.self.public_listener:
+                    this.self.public_out(
+                        player_id = competitor.id,
+                        player_name = competitor.name,
+                        player_cards = competitor.cards,
+                        _id = 'Public Show Cards'
+                    )
 
-            for i in grouped_indexes:
-                # these are the people competing for the part of the pot they bought
-                subgame_competitors = sorted_by_subgames[i:]
-                winning_players = subgame_competitors.winners()
-
-                # this is static for the loops bellow
-                # (winning players need to split the static money, while taking it
-                # out at the same time so the same money doesnt get won multiple times)
-                PLAYER_STAKES = [player.stake for player in this.players]
-                SUBGAME_STAKE = subgame_competitors[0].stake
-
-                # give winnings to players that split the subpot
-                for winning_split in winning_players:
-                    player_winnings = 0
-                    for player, PLAYER_STAKE in zip(this.players, PLAYER_STAKES):
-
-                        if 0 < PLAYER_STAKE <= SUBGAME_STAKE:
-                            take_home = PLAYER_STAKE / len(winning_players)
-                        elif 0 < SUBGAME_STAKE < PLAYER_STAKE:
-                            take_home = SUBGAME_STAKE / len(winning_players)
-                        else: # if SUBGAME_STAKE == 0 or PLAYER_STAKE == 0, theres nothing to collect
-                            continue
-
-                        player_winnings += take_home # winnings are added to the winner
-                        player.stake -= take_home # stakes are taken from the player
-
-                    # if players collected any left stakes (winnings)
-                    # it is added to their money, kickers set, and ou
-                    if round(player_winnings):
-                        winning_split.money += round(player_winnings)
-                        # this block is for public_out
-                        # subgame participants are players that you winning_split
-                        # had to beat to get player_winnings
-                        kickers = HandParser.getGroupKickers([player.hand for player in subgame_competitors])
+            # hands are ranked once (best first) for all the pots, and odd
+            # chips of a split pot go to the winners seated first from the
+            # small blind on (the seat before this.button, the big blind,
+            # as every player was active when the blinds were posted)
+            ranked = sorted(showdown, key = lambda x: x.hand.rank, reverse = True)
+            small_blind, nseats = this.players.index(this.button) - 1, len(this.players)
+            seat_order = lambda x: (this.players.index(x) - small_blind) % nseats
+
+            for pot, competitors in this.side_pots(stakes, showdown):
+                competing = set(player.id for player in competitors)
+                contenders = [player for player in ranked if player.id in competing]
+                best = contenders[0].hand.rank
+                winning_players = [player for player in contenders
+                                   if player.hand.rank == best]
+                share, odd = divmod(pot, len(winning_players))
+                odd_chips = set(player.id for player in
+                                sorted(winning_players, key = seat_order)[:odd])
+
+                for winning_split in competitors:
+                    if winning_split.hand.rank != best: continue
+                    won = share + (winning_split.id in odd_chips)
+                    if not won: continue
+                    winning_split.money += won
+                    # the best hand that lost the pot decides the kickers
+                    if this.self.public_listener:
+                        kickers = HandParser.getKickers(winning_split.hand,
+                            contenders[len(winning_players)].hand) \
+                            if len(contenders) > len(winning_players) else None
                         this.self.public_out(
                             winner_id = winning_split.id,
                             winner_name = winning_split.name,
-                            won = round(player_winnings),
+                            won = won,
                             hand_name = winning_split.hand.handenum,
                             hand_base = list(winning_split.hand.handbasecards),
                             kicker = kickers,
                              _id = 'Declare Finished Winner'
                         )
 
+        # pots as (chips, players competing for them), one for every stake
+        # of a player in showdown from the smallest up, built in one pass
+        # over the sorted stakes. Folded players' chips go to the pots their
+        # stakes reach, chips above the largest showdown stake to the last pot
+        def side_pots(this, stakes, showdown):
+            given = sorted(stakes.values())
+            pots, previous, i = [], 0, 0
+            for level in sorted(set(stakes[player.id] for player in showdown)):
+                pot = 0
+                while given[i] < level:
+                    pot += given[i] - previous
+                    i += 1
+                pot += (len(given) - i) * (level - previous)
+                pots.append([pot, [player for player in showdown
+                                   if stakes[player.id] >= level]])
+                previous = level
+            pots[-1][0] += sum(given[i:]) - (len(given) - i) * previous
+            return pots
+
 
     ### the methods from here are meant to be overriden when
     # baseclassing this class and implementing game IO
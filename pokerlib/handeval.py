@@ -0,0 +1,388 @@
+import mmap
+import struct
+from os import environ, getpid, replace
+from pathlib import Path
+from array import array
+from itertools import product, combinations
+from pokerlib.enums import Hand
+
+# Cards are encoded as small ints, code = suit * 13 + value, so that
+# the cards of one suit occupy 13 consecutive bits of a card bitmask.
+#
+# Every card code maps to an integer CARDKEY[code] and the key of a hand
+# is the plain sum of its cards' keys, so it can be built incrementally
+# (board + hole cards) by addition. A key is packed as
+#   bits  0-16  quinary counts of values TWO..EIGHT   (5^7 < 2^17)
+#   bits 17-30  quinary counts of values NINE..ACE    (5^6 < 2^14)
+#   bits 31-42  3-bit card counters for each suit
+#   bits 43-45  number of cards
+#   bits 46-97  the card bitmask
+# The quinary halves index a minimal perfect hash into NOFLUSH,
+# suit counters index FLUSHSUIT and the masked suit bits index FLUSH.
+#
+# A rank is category << 20 followed by the values of the five cards
+# making the hand (base first, then kickers) in 4-bit nibbles,
+# so two ranks compare the same way the hands they represent do.
+
+LOWVALUES, HIGHVALUES = 7, 6
+LOWSIZE, HIGHSIZE = 5 ** LOWVALUES, 5 ** HIGHVALUES
+HIGHSHIFT, SUITSHIFT, COUNTSHIFT, BITSHIFT = 17, 31, 43, 46
+MAXCARDS = 7
+
+CATEGORYSHIFT = 20
+BASELENS = {
+    Hand.HIGHCARD: 1, Hand.ONEPAIR: 2, Hand.TWOPAIR: 4,
+    Hand.THREEOFAKIND: 3, Hand.STRAIGHT: 5, Hand.FLUSH: 5,
+    Hand.FULLHOUSE: 5, Hand.FOUROFAKIND: 4, Hand.STRAIGHTFLUSH: 5
+}
+
+def cardCode(card):
+    value, suit = card
+    return suit * 13 + value
+
+def codeCard(code):
+    return [code % 13, code // 13]
+
+def cardKey(code):
+    suit, value = divmod(code, 13)
+    quinary = 5 ** value if value < LOWVALUES else \
+        5 ** (value - LOWVALUES) << HIGHSHIFT
+    return quinary + (1 << SUITSHIFT + 3 * suit) + \
+        (1 << COUNTSHIFT) + (1 << BITSHIFT + code)
+
+CARDKEY = [cardKey(code) for code in range(52)]
+
+def cardsKey(codes):
+    return sum(map(CARDKEY.__getitem__, codes))
+
+# tables are generated once, saved to TABLEDIR and memory-mapped
+# from there when an evaluation is first requested (so processes share
+# the pages), TABLEVERSION has to change whenever the layout does
+TABLEVERSION = 2
+TABLEDIR = Path(environ.get('POKERLIB_TABLES', Path(__file__).parent))
+TABLEFILE = TABLEDIR / f'handeval{TABLEVERSION}.tables'
+OMAHAFILE = TABLEDIR / f'handeval{TABLEVERSION}-omaha.tables'
+TABLEHEADER = struct.Struct('=4sII')
+
+FLUSHSUIT = FLUSH = OFFSETS = LOWINDEX = NOFLUSH = None
+OMAHA = None
+
+def packRank(handenum, values):
+    rank = handenum
+    for i in range(5):
+        rank <<= 4
+        if i < len(values): rank |= values[i]
+    return rank
+
+def rankHand(rank):
+    return Hand(rank >> CATEGORYSHIFT)
+
+def rankValues(rank, ncards=5):
+    return [rank >> 4 * (4 - i) & 0xF for i in range(min(ncards, 5))]
+
+def straightTop(mask):
+    for top in range(12, 3, -1):
+        if mask >> (top - 4) & 0x1F == 0x1F: return top
+    if mask & 0x100F == 0x100F: return 3
+
+def straightValues(top):
+    return [top - i for i in range(4)] + [top - 4 if top > 3 else 12]
+
+def flushRank(mask):
+    top = straightTop(mask)
+    if top is not None:
+        return packRank(Hand.STRAIGHTFLUSH, straightValues(top))
+    values = [val for val in reversed(range(13)) if mask >> val & 1]
+    return packRank(Hand.FLUSH, values[:5])
+
+def multisetRank(valnums):
+    ncards = sum(valnums)
+    bycount = [[], [], [], [], []]
+    for val in reversed(range(13)): bycount[valnums[val]].append(val)
+    fours, threes, twos = bycount[4], bycount[3], bycount[2]
+    top = straightTop(sum(1 << val for val in range(13) if valnums[val]))
+
+    # values not included in the hand base, from highest to lowest
+    def rest(*base):
+        return [val for val in reversed(range(13))
+                if valnums[val] and val not in base]
+
+    if fours:
+        handenum, values = Hand.FOUROFAKIND, [fours[0]] * 4 + rest(fours[0])
+    elif threes and len(threes) + len(twos) >= 2:
+        pair = max(threes[1:] + twos)
+        handenum, values = Hand.FULLHOUSE, [threes[0]] * 3 + [pair] * 2
+    elif top is not None:
+        handenum, values = Hand.STRAIGHT, straightValues(top)
+    elif threes:
+        handenum, values = Hand.THREEOFAKIND, [threes[0]] * 3 + rest(threes[0])
+    elif len(twos) >= 2:
+        handenum = Hand.TWOPAIR
+        values = [twos[0]] * 2 + [twos[1]] * 2 + rest(twos[0], twos[1])
+    elif twos:
+        handenum, values = Hand.ONEPAIR, [twos[0]] * 2 + rest(twos[0])
+    else:
+        handenum, values = Hand.HIGHCARD, rest()
+
+    return packRank(handenum, values[:min(ncards, 5)])
+
+def quinaryPatterns(nvalues):
+    # every count vector (lowest value first) with at most 4 of a value
+    # and at most MAXCARDS cards, listed in order of its quinary number
+    patterns = []
+    for counts in product(range(5), repeat=nvalues):
+        counts = counts[::-1]
+        patterns.append(counts if sum(counts) <= MAXCARDS else None)
+    return patterns
+
+# count vectors of all value multisets of ncards in NOFLUSH order
+def multisets(ncards, lows, highs, bycount):
+    for high in highs:
+        if high is None or sum(high) > ncards: continue
+        for low in bycount[ncards - sum(high)]:
+            yield low + high
+
+def buildTables():
+    flushsuit = array('b', [-1]) * 2 ** 12
+    for suitkey in range(2 ** 12):
+        for suit in range(4):
+            if suitkey >> 3 * suit & 7 >= 5:
+                flushsuit[suitkey] = suit
+
+    flush = array('i', [0]) * 2 ** 13
+    for mask in range(2 ** 13):
+        if bin(mask).count('1') >= 5:
+            flush[mask] = flushRank(mask)
+
+    lows, highs = quinaryPatterns(LOWVALUES), quinaryPatterns(HIGHVALUES)
+    # lowindex orders the low patterns with the same number of cards
+    lowindex, bycount = array('i', [0]) * LOWSIZE, [[] for _ in range(MAXCARDS + 1)]
+    for lowkey, counts in enumerate(lows):
+        if counts is None: continue
+        lowindex[lowkey] = len(bycount[sum(counts)])
+        bycount[sum(counts)].append(counts)
+
+    # offsets[ncards * HIGHSIZE + highkey] is where the block of hands
+    # with those high values and ncards - len(high) low cards starts
+    offsets, noflush = array('i', [0]) * ((MAXCARDS + 1) * HIGHSIZE), array('i')
+    for ncards in range(MAXCARDS + 1):
+        for highkey, high in enumerate(highs):
+            if high is None or sum(high) > ncards: continue
+            offsets[ncards * HIGHSIZE + highkey] = len(noflush)
+            for low in bycount[ncards - sum(high)]:
+                noflush.append(multisetRank(low + high))
+
+    return flushsuit, flush, offsets, lowindex, noflush
+
+# omaha[pair * NBOARDS + board] is the best non-flush rank of two hole
+# cards and three of five board cards, where pair and board are the
+# indexes of their value multisets within the NOFLUSH blocks of 2 and 5
+def buildOmahaTable():
+    lows, highs = quinaryPatterns(LOWVALUES), quinaryPatterns(HIGHVALUES)
+    bycount = [[] for _ in range(MAXCARDS + 1)]
+    for counts in lows:
+        if counts is not None: bycount[sum(counts)].append(counts)
+
+    def valueKey(counts):
+        low = sum(num * 5 ** val for val, num in enumerate(counts[:LOWVALUES]))
+        high = sum(num * 5 ** val for val, num in enumerate(counts[LOWVALUES:]))
+        return low + (high << HIGHSHIFT)
+
+    offset = 5 * HIGHSIZE
+    pairs = list(multisets(2, lows, highs, bycount))
+    omaha = array('i')
+    boards = list(multisets(5, lows, highs, bycount))
+    boardtriples = []
+    for counts in boards:
+        values = [val for val, num in enumerate(counts) for _ in range(num)]
+        triples = set(combinations(values, 3))
+        boardtriples.append([
+            (valueKey([triple.count(val) for val in range(13)]),
+             triple[0] if triple[0] == triple[2] else None)
+            for triple in triples
+        ])
+
+    for pair in pairs:
+        pairkey = valueKey(pair)
+        # a pocket pair can't be joined with three cards of its value
+        pocket = pair.index(2) if 2 in pair else None
+        for triples in boardtriples:
+            omaha.append(max(
+                NOFLUSH[OFFSETS[offset + (pairkey + key >> HIGHSHIFT)]
+                        + LOWINDEX[pairkey + key & 0x1FFFF]]
+                for key, trips in triples if trips is None or trips != pocket
+            ))
+
+    return [omaha]
+
+def writeTables(path, tables, version=TABLEVERSION):
+    # written under a temporary name, so concurrent workers
+    # never map a partially written file
+    temp = path.with_name(f'{path.name}.{getpid()}.tmp')
+    with open(temp, 'wb') as file:
+        file.write(TABLEHEADER.pack(b'PKEV', version, len(tables)))
+        sizes = array('I', [len(table) * table.itemsize for table in tables])
+        # header is padded so the int tables are aligned
+        if len(tables) % 2: sizes.append(0)
+        file.write(sizes.tobytes())
+        for table in tables: file.write(table.tobytes())
+    replace(temp, path)
+
+# returns None if the file is not a table file of this version
+# (files of other modules have versions of their own)
+def mapTables(path, typecodes, version=TABLEVERSION):
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, fileversion, ntables = TABLEHEADER.unpack_from(mapped)
+    if magic != b'PKEV' or fileversion != version or \
+    ntables != len(typecodes): return None
+
+    pos = TABLEHEADER.size + 4 * (ntables + ntables % 2)
+    view, tables = memoryview(mapped), []
+    sizes = view[TABLEHEADER.size:pos].cast('I')
+    if len(mapped) != pos + sum(sizes): return None
+    for size, typecode in zip(sizes, typecodes):
+        tables.append(view[pos:pos+size].cast(typecode))
+        pos += size
+    return tables
+
+# tables of the file at path, which are built and written there if it is
+# missing or outdated, unless build is None (slow builds that should be
+# run on purpose), then FileNotFoundError is raised
+def loadTableFile(path, typecodes, build=None, version=TABLEVERSION):
+    try: tables = mapTables(path, typecodes, version)
+    except (OSError, ValueError, struct.error): tables = None
+
+    if tables is None:
+        if build is None:
+            raise FileNotFoundError(f'no table file of version {version} at {path}')
+        tables = build()
+        # if the file can't be written tables stay private to the process
+        try: writeTables(path, tables, version)
+        except OSError: pass
+        else: tables = mapTables(path, typecodes, version) or tables
+
+    return tables
+
+def loadTables():
+    global FLUSHSUIT, FLUSH, OFFSETS, LOWINDEX, NOFLUSH
+    FLUSHSUIT, FLUSH, OFFSETS, LOWINDEX, NOFLUSH = \
+        loadTableFile(TABLEFILE, ['b', 'i', 'i', 'i', 'i'], buildTables)
+
+# the omaha table is only needed (and built) for omaha tables
+def loadOmahaTable():
+    global OMAHA
+    if NOFLUSH is None: loadTables()
+    OMAHA, = loadTableFile(OMAHAFILE, ['i'], buildOmahaTable)
+
+def evaluateKey(key):
+    if NOFLUSH is None: loadTables()
+    suit = FLUSHSUIT[key >> SUITSHIFT & 0xFFF]
+    if suit >= 0:
+        return FLUSH[key >> BITSHIFT + 13 * suit & 0x1FFF]
+    return NOFLUSH[
+        OFFSETS[(key >> COUNTSHIFT & 7) * HIGHSIZE + (key >> HIGHSHIFT & 0x3FFF)]
+        + LOWINDEX[key & 0x1FFFF]
+    ]
+
+# cards are card codes, this is the entry point for up to 7 cards
+def evaluate(codes):
+    return evaluateKey(sum(map(CARDKEY.__getitem__, codes)))
+
+def noflushIndex(key):
+    return OFFSETS[(key >> COUNTSHIFT & 7) * HIGHSIZE + (key >> HIGHSHIFT & 0x3FFF)] \
+        + LOWINDEX[key & 0x1FFFF]
+
+# omaha hands use exactly two of the four hole cards and three of the
+# five board cards, the best non-flush hand of every hole pair is read
+# from OMAHA and only suits on the board three times are checked for flush
+def evaluateOmaha(hole, board):
+    if len(board) != 5: return evaluate(omahaCards(hole, board))
+    if OMAHA is None: loadOmahaTable()
+    boardkey = cardsKey(board)
+    nboards = OFFSETS[6 * HIGHSIZE] - OFFSETS[5 * HIGHSIZE]
+    boardindex = noflushIndex(boardkey) - OFFSETS[5 * HIGHSIZE]
+    holepairs = list(combinations(hole, 2))
+    best = max(
+        OMAHA[(noflushIndex(CARDKEY[a] + CARDKEY[b]) - OFFSETS[2 * HIGHSIZE])
+              * nboards + boardindex]
+        for a, b in holepairs
+    )
+
+    for suit in range(4):
+        if boardkey >> SUITSHIFT + 3 * suit & 7 < 3: continue
+        boardsuited = [code for code in board if code // 13 == suit]
+        holesuited = [code for code in hole if code // 13 == suit]
+        for codes in product(combinations(holesuited, 2),
+                             combinations(boardsuited, 3)):
+            mask = sum(1 << code % 13 for code in codes[0] + codes[1])
+            best = max(best, FLUSH[mask])
+
+    return best
+
+# cards making the omaha hand of the given rank (or the best one),
+# for any number of board cards (with less than three all are used)
+def omahaCards(hole, board, rank=None):
+    best, bestcodes = -1, ()
+    for holecodes in combinations(hole, 2):
+        for boardcodes in combinations(board, min(len(board), 3)):
+            handrank = evaluate(holecodes + boardcodes)
+            if handrank == rank: return holecodes + boardcodes
+            if handrank > best: best, bestcodes = handrank, holecodes + boardcodes
+    return bestcodes
+
+# numpy views of the tables and CARDKEY split into two int64 parts,
+# the low 46 bits and the card bitmask, as the full key does not fit
+# into an int64 (numpy is needed only here)
+NPTABLES = None
+
+def loadNumpyTables():
+    global NPTABLES
+    import numpy as np
+    if NOFLUSH is None: loadTables()
+    NPTABLES = (
+        np.array([key & (1 << BITSHIFT) - 1 for key in CARDKEY], np.int64),
+        np.array([key >> BITSHIFT for key in CARDKEY], np.int64),
+        np.frombuffer(FLUSHSUIT, np.int8), np.frombuffer(FLUSH, np.int32),
+        np.frombuffer(OFFSETS, np.int32), np.frombuffer(LOWINDEX, np.int32),
+        np.frombuffer(NOFLUSH, np.int32)
+    )
+
+# numpy parts of the keys of an (N, k) array of card codes,
+# which can be summed up with the parts of other cards
+def batchKeys(cards):
+    import numpy as np
+    if NPTABLES is None: loadNumpyTables()
+    cards = np.asarray(cards, np.intp)
+    return NPTABLES[0][cards].sum(axis=-1), NPTABLES[1][cards].sum(axis=-1)
+
+# ranks of hands given by the two int64 parts of their keys
+def evaluateBatchKeys(keys, bits):
+    import numpy as np
+    if NPTABLES is None: loadNumpyTables()
+    _, _, flushsuit, flush, offsets, lowindex, noflush = NPTABLES
+
+    ranks = noflush[
+        offsets[(keys >> COUNTSHIFT & 7) * HIGHSIZE + (keys >> HIGHSHIFT & 0x3FFF)]
+        + lowindex[keys & 0x1FFFF]
+    ]
+    suits = flushsuit[keys >> SUITSHIFT & 0xFFF]
+    flushed = np.flatnonzero(suits >= 0)
+    if len(flushed):
+        ranks[flushed] = flush[bits[flushed] >> 13 * suits[flushed] & 0x1FFF]
+    return ranks
+
+# cards is an (N, k) integer array of card codes with k <= 7, rows are
+# evaluated in chunks so temporaries stay bounded for large N
+def evaluateBatch(cards, chunksize=2**16):
+    import numpy as np
+    cards = np.asarray(cards, np.intp)
+    ranks = np.empty(len(cards), np.int32)
+    for start in range(0, len(cards), chunksize):
+        ranks[start:start+chunksize] = evaluateBatchKeys(
+            *batchKeys(cards[start:start+chunksize]))
+    return ranks
+
+if __name__ == '__main__':
+    loadOmahaTable()
+    print(TABLEFILE, OMAHAFILE)
@@ -0,0 +1,226 @@
+from pathlib import Path
+from sys import argv
+from struct import Struct, iter_unpack
+from pokerlib.enums import Value, Suit, Hand
+from pokerlib.game import PokerGame
+from pokerlib.handparser import HandParser, OmahaHandParser
+from pokerlib import handeval
+
+# Hand histories are append-only files of rounds, each written once it
+# is over as a record of its length (uint32) followed by the players
+# (count, then length prefixed utf-8 id and name, where an empty name is
+# the same as the id) and its events. Every event is a fixed 7 byte
+# struct of the event code, the player's index in the round (or NOPLAYER),
+# a small extra (number of cards, hand category) and a uint32 value
+# (chips, round index or up to four card codes, one per byte).
+# Events that can be derived from the others (To Call, All-In Equity)
+# and input errors are not recorded, neither are hand bases of winners,
+# which replay recomputes from the cards. Kickers depend on the hands
+# a pot was contested by, so a winner's kickers follow it as a KICKER
+# event (their values packed in 4 bits each), which replay merges into it.
+
+MAGIC = b'PLHH\x02'
+NOPLAYER = 0xff
+LENGTH = Struct('<I')
+EVENT = Struct('<BBBI')
+
+EVENTS = [
+    'New Round', 'Dealt Cards', 'Small Blind', 'Big Blind',
+    'Player Raised', 'Player Called', 'Player Checked', 'Player Folded',
+    'Player Went All-In', 'New Turn', 'Public Show Cards',
+    'Declare Unfinished Winner', 'Declare Finished Winner', 'Player Lost Money'
+]
+EVENTCODES = {name: code for code, name in enumerate(EVENTS)}
+NEWROUND, DEALT, NEWTURN, SHOWCARDS, UNFINISHEDWINNER, FINISHEDWINNER = \
+    [EVENTCODES[name] for name in ['New Round', 'Dealt Cards', 'New Turn',
+        'Public Show Cards', 'Declare Unfinished Winner', 'Declare Finished Winner']]
+KICKER = len(EVENTS)
+# the public_out argument stored as the value of an event
+VALUEFIELDS = {
+    'New Round': 'round_index', 'Small Blind': 'given', 'Big Blind': 'given',
+    'Player Raised': 'raised', 'Player Called': 'called',
+    'Player Went All-In': 'player_money',
+    'Declare Unfinished Winner': 'won', 'Declare Finished Winner': 'won'
+}
+VALUECODES = {EVENTCODES[name]: field for name, field in VALUEFIELDS.items()}
+TURNNAMES = {3: 'FLOP', 4: 'TURN', 5: 'RIVER'}
+
+def packCards(cards):
+    return sum(handeval.cardCode(card) << 8 * i for i, card in enumerate(cards))
+
+def unpackCards(value, ncards):
+    return [[Value(code % 13), Suit(code // 13)] for code in
+            ((value >> 8 * i) & 0xff for i in range(ncards))]
+
+# strings longer than 255 bytes are cut to the last whole character
+def packString(string):
+    data = str(string).encode()[:0xff].decode(errors='ignore').encode()
+    return bytes([len(data)]) + data
+
+# Writes the events of rounds to the file at path, a round is appended
+# when the next one starts or the history is flushed or closed
+class HandHistory:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.exists() and self.path.stat().st_size:
+            with open(self.path, 'rb') as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f'{self.path} is not a hand history')
+        self.file = open(self.path, 'ab')
+        if self.file.tell() == 0: self.file.write(MAGIC)
+        self.newRound()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def newRound(self):
+        self.players = {}
+        self.names = []
+        self.events = bytearray()
+        self.ntable = 0
+
+    # index of the player in the current round, adding it on first sight
+    def playerIndex(self, player_id, player_name):
+        if player_id not in self.players:
+            self.players[player_id] = len(self.names)
+            name = '' if player_name == player_id else player_name
+            self.names.append(packString(player_id) + packString(name))
+        return self.players[player_id]
+
+    def deal(self, player, cards):
+        self.events += EVENT.pack(DEALT, self.playerIndex(player.id, player.name),
+                                  len(cards), packCards(cards))
+
+    # records the keyword arguments of a public_out call
+    def record(self, kwargs):
+        code = EVENTCODES.get(kwargs.get('_id'))
+        if code is None: return
+        if code == NEWROUND: self.flush()
+
+        player, extra, value = NOPLAYER, 0, 0
+        if 'player_id' in kwargs:
+            player = self.playerIndex(kwargs['player_id'], kwargs['player_name'])
+        elif 'winner_id' in kwargs:
+            player = self.playerIndex(kwargs['winner_id'], kwargs['winner_name'])
+        if code in VALUECODES: value = kwargs[VALUECODES[code]]
+        if code == NEWTURN:
+            cards = kwargs['table'][self.ntable:]
+            self.ntable = len(kwargs['table'])
+            extra, value = len(cards), packCards(cards)
+        elif code == FINISHEDWINNER:
+            extra = kwargs['hand_name']
+        self.events += EVENT.pack(code, player, extra, value)
+        if code == FINISHEDWINNER and kwargs['kicker']:
+            kicker = kwargs['kicker']
+            self.events += EVENT.pack(KICKER, player, len(kicker),
+                sum(value << 4 * i for i, value in enumerate(kicker)))
+
+    def flush(self):
+        if self.events:
+            record = bytes([len(self.names)]) + b''.join(self.names) + self.events
+            self.file.write(LENGTH.pack(len(record)) + record)
+            self.file.flush()
+        self.newRound()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Game that records its rounds to history (a HandHistory), it can be
+# combined with other games as class Game(RecordedGame, TerminalGame)
+# so their public_out and private_out are still called
+class RecordedGame(PokerGame):
+
+    def __init__(self, *args, history, **kwargs):
+        self.history = history
+        super().__init__(*args, **kwargs)
+
+    def private_out(self, player, *args, **kwargs):
+        if kwargs.get('_id') == 'Dealt Cards':
+            self.history.deal(player, kwargs['cards'])
+        super().private_out(player, *args, **kwargs)
+
+    def public_out(self, *args, **kwargs):
+        if kwargs: self.history.record(kwargs)
+        super().public_out(*args, **kwargs)
+
+# the records of the rounds in the history at path, which is
+# only scanned by their lengths (a round cut off while written is skipped)
+def readRounds(path):
+    with open(path, 'rb') as file: data = file.read()
+    if not data.startswith(MAGIC): raise ValueError(f'{path} is not a hand history')
+    i = len(MAGIC)
+    while i + LENGTH.size <= len(data):
+        (length,), i = LENGTH.unpack_from(data, i), i + LENGTH.size
+        if i + length > len(data): return
+        yield data[i:i+length]
+        i += length
+
+# players of the round as (id, name) pairs and its events
+# as (code, player index, extra, value) tuples
+def decodeRound(record):
+    players, i = [], 1
+    for _ in range(record[0]):
+        strings = []
+        for _ in range(2):
+            length = record[i]
+            strings.append(record[i+1:i+1+length].decode())
+            i += 1 + length
+        players.append((strings[0], strings[1] or strings[0]))
+    return players, list(iter_unpack(EVENT.format, record[i:]))
+
+# hand of a winner rebuilt the way the round built it, from its hole
+# cards with every turn's cards added, so hand bases come out the same
+def winnerHand(hole, turns):
+    hand = (OmahaHandParser if len(hole) == 4 else HandParser)(list(hole))
+    for cards in turns: hand.addCards(list(cards))
+    hand.parse()
+    return hand
+
+# rounds as lists of (_id, kwargs) in the form PokerGame passes them to
+# public_out (Dealt Cards included, with player_id and player_name),
+# without the events that are not recorded
+def replay(path):
+    for record in readRounds(path):
+        players, events = decodeRound(record)
+        cards, table, turns, out = {}, [], [], []
+        for code, player, extra, value in events:
+            if code == KICKER:
+                out[-1][1]['kicker'] = [Value(value >> 4 * i & 0xf) for i in range(extra)]
+                continue
+            name, kwargs = EVENTS[code], {}
+            if player != NOPLAYER:
+                prefix = 'winner' if name.startswith('Declare') else 'player'
+                kwargs[prefix + '_id'], kwargs[prefix + '_name'] = players[player]
+            if code in VALUECODES: kwargs[VALUECODES[code]] = value
+            if code == DEALT:
+                kwargs['cards'] = cards[player] = tuple(unpackCards(value, extra))
+            elif code == NEWTURN:
+                turns.append(unpackCards(value, extra))
+                table = table + turns[-1]
+                kwargs['turn_name'], kwargs['table'] = TURNNAMES[len(table)], table
+            elif code == SHOWCARDS:
+                kwargs['player_cards'] = cards[player]
+            elif code == FINISHEDWINNER:
+                kwargs['hand_name'] = Hand(extra)
+                kwargs['hand_base'] = list(winnerHand(cards[player], turns).handbasecards)
+                kwargs['kicker'] = None
+            out.append((name, kwargs))
+        yield out
+
+if __name__ == '__main__':
+    # python -m pokerlib.handhistory path prints a summary of the history:
+    # rounds, events and chips won by every player
+    rounds = events = 0
+    won = {}
+    for record in readRounds(argv[1]):
+        players, decoded = decodeRound(record)
+        rounds, events = rounds + 1, events + len(decoded)
+        for code, player, _, value in decoded:
+            if code in (UNFINISHEDWINNER, FINISHEDWINNER):
+                won[players[player][0]] = won.get(players[player][0], 0) + value
+    print({'rounds': rounds, 'events': events, 'won': won})
@@ -1,37 +1,46 @@
 from bisect import insort
-from pokerlib.enums import Hand, Value, Suit
+from pokerlib.enums import Hand
+from pokerlib import handeval
 
 class HandParser:
     __slots__ = [
         "original", "ncards", "cards",
-        "handenum", "handbase", "kickers",
-        "__valnums", "__suitnums",
-        "__flushsuit", "__straightindexes"
+        "__handenum", "__rank", "__key",
+        "__handbase", "__kickers"
     ]
+    holecards = 2
 
     def __init__(self, cards: list):
         self.original = cards
         self.ncards = len(cards)
         self.cards = sorted(cards, key = lambda x: x[0])
 
-        self.handenum = None
-        self.handbase = []
-        self.kickers = []
+        self.__handenum = None
+        self.__rank = None
 
-        self.__valnums = [0] * 13
-        self.__suitnums = [0] * 4
-        for value, suit in cards:
-            self.__valnums[value] += 1
-            self.__suitnums[suit] += 1
+        self.__key = handeval.cardsKey(map(handeval.cardCode, cards))
+        self.__handbase = None
+        self.__kickers = None
 
-        self.__flushsuit = None
-        for suit in Suit:
-            if self.__suitnums[suit] >= 5:
-                self.__flushsuit = suit
-                break
+    # rank is evaluated from the cards on first use (comparisons,
+    # handenum, handbase or kickers), so hands need not be parsed
+    @property
+    def rank(self):
+        if self.__rank is None: self.parse()
+        return self.__rank
+    @property
+    def handenum(self):
+        if self.__handenum is None: self.parse()
+        return self.__handenum
 
-        self.__straightindexes = \
-            self.getStraightIndexes(self.__valnums)
+    @property
+    def handbase(self):
+        if self.__handbase is None: self.setIndexes()
+        return self.__handbase
+    @property
+    def kickers(self):
+        if self.__kickers is None: self.setIndexes()
+        return self.__kickers
 
     @property
     def handbasecards(self):
@@ -58,214 +67,98 @@ class HandParser:
     def __repr__(self):
         return f"HandParser({self.cards})"
 
+    def __hash__(self):
+        return hash(self.rank)
+
     def __eq__(self, other):
-        if self.handenum != other.handenum: return False
-        for (s_val, _), (o_val, _) in zip(self.handfullcards,
-                                          other.handfullcards):
-            if s_val != o_val: return False
-        return True
+        return self.rank == other.rank
 
     def __gt__(self, other):
-        if self.handenum != other.handenum:
-            return self.handenum > other.handenum
-        for (s_val, _), (o_val, _) in zip(self.handfullcards,
-                                          other.handfullcards):
-            if s_val != o_val: return s_val > o_val
-        return False
+        return self.rank > other.rank
 
     def __lt__(self, other):
-        return other > self
+        return self.rank < other.rank
+
+    def __ge__(self, other):
+        return self.rank >= other.rank
 
-    def addCards(self, cards):
+    def __le__(self, other):
+        return self.rank <= other.rank
+
+    # key can be passed if cards were already summed up by handeval,
+    # e.g. when the same board cards are added to several hands
+    def addCards(self, cards, key=None):
         self.original.extend(cards)
         self.ncards += len(cards)
         for card in cards: insort(self.cards, card)
 
-        self.handenum = None
-        self.handbase.clear()
-        self.kickers.clear()
-
-        for value, suit in cards:
-            self.__valnums[value] += 1
-            self.__suitnums[suit] += 1
+        self.__handenum = None
+        self.__rank = None
+        self.__handbase = None
+        self.__kickers = None
 
-        for suit in Suit:
-            if self.__suitnums[suit] >= 5:
-                self.__flushsuit = suit
-                break
-
-        self.__straightindexes = \
-            self.getStraightIndexes(self.__valnums)
-
-    @staticmethod
-    def getStraightIndexes(valnums):
-        straightindexes = [None] * 5
-        straightlen, indexptr = 1, sum(valnums)
-        for i in reversed(range(len(valnums))):
-            indexptr -= valnums[i]
-            if valnums[i-1] and valnums[i]:
-                straightindexes[straightlen-1] = indexptr
-                straightlen += 1
-                if straightlen == 5:
-                    if indexptr == 0:
-                        indexptr = sum(valnums)-1
-                    else: indexptr -= valnums[i-1]
-                    straightindexes[4] = indexptr
-                    return straightindexes
-            else: straightlen = 1
-
-    def setStraightFlush(self):
-        counter = 0
-        suited_vals, permut = [0] * 13, [0] * len(self.cards)
-        for i, (val, suit) in enumerate(self.cards):
-             if suit == self.__flushsuit:
-                 suited_vals[val] += 1
-                 permut[counter] = i
-                 counter += 1
-
-        suited_handbase = self.getStraightIndexes(suited_vals)
-        if suited_handbase is not None:
-            self.handenum = Hand.STRAIGHTFLUSH
-            self.handbase = [permut[i] for i in suited_handbase]
-            return True
-
-        return False
-
-    def setFourOfAKind(self):
-        self.handenum = Hand.FOUROFAKIND
-
-        hindex = -1
-        for valnum in self.__valnums:
-            hindex += valnum
-            if valnum == 4: break
-
-        self.handbase = [hindex, hindex-1, hindex-2, hindex-3]
-
-    def setFullHouse(self):
-        self.handenum = Hand.FULLHOUSE
-
-        threes, twos = [], []
-        hindex = -1
-        for val, valnum in enumerate(self.__valnums):
-            hindex += valnum
-            if valnum == 3: threes.append((val, hindex))
-            elif valnum == 2: twos.append((val, hindex))
-
-        i1, i2 = [threes.pop()[1], max(threes + twos)[1]]
-        self.handbase = [i1, i1-1, i1-2, i2, i2-1]
-
-    def setFlush(self):
-        self.handenum = Hand.FLUSH
-        self.handbase.clear()
-
-        counter = 0
-        for i in reversed(range(self.ncards)):
-            if self.cards[i][1] == self.__flushsuit:
-                self.handbase.append(i)
-                counter += 1
-            if counter == 5:
-                break
-
-    def setStraight(self):
-        self.handenum = Hand.STRAIGHT
-        self.handbase = self.__straightindexes
-
-    def setThreeOfAKind(self):
-        self.handenum = Hand.THREEOFAKIND
-        self.handbase.clear()
-
-        hindex = -1
-        for valnum in self.__valnums:
-            hindex += valnum
-            if valnum == 3: break
-
-        self.handbase = [hindex, hindex-1, hindex-2]
-
-    def setTwoPair(self):
-        self.handenum = Hand.TWOPAIR
-        self.handbase.clear()
-
-        hindex, paircounter = self.ncards, 0
-        for valnum in reversed(self.__valnums):
-            hindex -= valnum
-            if valnum == 2:
-                self.handbase.extend([hindex+1, hindex])
-                paircounter += 1
-                if paircounter == 2: break
-
-    def setOnePair(self):
-        self.handenum = Hand.ONEPAIR
-
-        hindex = -1
-        for valnum in self.__valnums:
-            hindex += valnum
-            if valnum == 2: break
-
-        self.handbase = [hindex, hindex-1]
-
-    def setHighCard(self):
-        self.handenum = Hand.HIGHCARD
-        self.handbase = [self.ncards - 1]
+        if key is None:
+            key = handeval.cardsKey(map(handeval.cardCode, cards))
+        self.__key += key
 
     def parse(self):
-        pairnums = [0] * 5
-        for num in self.__valnums: pairnums[num] += 1
-
-        # straight flush
-        if None not in [self.__straightindexes, self.__flushsuit] \
-        and self.setStraightFlush(): pass
-
-        # four of a kind
-        elif pairnums[4]:
-            self.setFourOfAKind()
-
-        # full house
-        elif pairnums[3] == 2 or pairnums[3] == 1 and pairnums[2] >= 1:
-            self.setFullHouse()
-
-        # flush
-        elif self.__flushsuit is not None:
-            self.setFlush()
-
-        # straight
-        elif self.__straightindexes is not None:
-            self.setStraight()
+        self.setRank(handeval.evaluateKey(self.__key))
 
-        # three of a kind
-        elif pairnums[3]:
-            self.setThreeOfAKind()
+    def setRank(self, rank):
+        self.__rank = rank
+        self.__handenum = handeval.rankHand(rank)
+        self.__handbase = None
+        self.__kickers = None
 
-        # two pair
-        elif pairnums[2] >= 2:
-            self.setTwoPair()
-
-        # one pair
-        elif pairnums[2] == 1:
-            self.setOnePair()
-
-        # high card
-        else: self.setHighCard()
-
-        self.getKickers()
-
-    def getKickers(self):
-        self.kickers.clear()
-        
-        inhand = [False] * self.ncards
-        for i in self.handbase: inhand[i] = True
-        
-        i, lim = self.ncards - 1, 5 - len(self.handbase)
-        while len(self.kickers) < lim and i >= 0:
-            if not inhand[i]: self.kickers.append(i)
-            i -= 1
+    # cards is an (N, k) integer array of handeval card codes,
+    # returns ranks of the hands (int32) and their categories as an
+    # object array of Hand members, looked up by the category index
+    @staticmethod
+    def parseBatch(cards):
+        import numpy as np
+        ranks = handeval.evaluateBatch(cards)
+        hands = np.array(list(Hand), dtype=object)
+        return ranks, hands[ranks >> handeval.CATEGORYSHIFT]
+
+    # indexes of self.cards that the hand can be made of
+    def usableIndexes(self):
+        return range(self.ncards)
+
+    # translates the values packed in rank to indexes of self.cards,
+    # taking the highest not yet used card of each value
+    def setIndexes(self):
+        usable = self.usableIndexes()
+        flushsuit = None
+        if self.handenum in [Hand.FLUSH, Hand.STRAIGHTFLUSH]:
+            suitnums = [0] * 4
+            for i in usable: suitnums[self.cards[i][1]] += 1
+            flushsuit = suitnums.index(max(suitnums))
+
+        indexes, used = [], [False] * self.ncards
+        for val in handeval.rankValues(self.rank, len(usable)):
+            for i in reversed(usable):
+                card_val, card_suit = self.cards[i]
+                if not used[i] and card_val == val and \
+                flushsuit in [None, card_suit]:
+                    used[i] = True
+                    indexes.append(i)
+                    break
+
+        baselen = handeval.BASELENS[self.handenum]
+        self.__handbase = indexes[:baselen]
+        self.__kickers = indexes[baselen:]
 
     @classmethod
     def getGroupKickers(cls, hands: list):
         winner = max(hands)
         losers = [hand for hand in hands if hand < winner]
         if not losers: return # everyone in hands is split evenly
-        max_loser = max(losers)
+        return cls.getKickers(winner, max(losers))
 
+    # kickers by which winner beat max_loser (the best of the hands it
+    # beat), or None if they did not decide, for callers that ranked hands
+    @classmethod
+    def getKickers(cls, winner, max_loser):
         # if winner won by a hand level there is no kicker
         if winner.handenum > max_loser.handenum: return
         winner_best_vals = [val for val, _ in winner.handbasecards]
@@ -292,3 +185,30 @@ class HandParser:
         for w_val, l_val in searchForKicker:
             kickers.append(w_val)
             if w_val > l_val: return kickers
+
+
+# hand of four hole cards, which are the cards it is constructed with,
+# and the board cards added later, using exactly two hole cards
+class OmahaHandParser(HandParser):
+    __slots__ = ["hole", "board"]
+    holecards = 4
+
+    def __init__(self, cards: list):
+        super().__init__(cards)
+        self.hole = list(map(handeval.cardCode, cards))
+        self.board = []
+
+    def __repr__(self):
+        return f"OmahaHandParser({self.cards})"
+
+    def addCards(self, cards, key=None):
+        super().addCards(cards, key)
+        self.board.extend(map(handeval.cardCode, cards))
+
+    def parse(self):
+        self.setRank(handeval.evaluateOmaha(self.hole, self.board))
+
+    def usableIndexes(self):
+        codes = handeval.omahaCards(self.hole, self.board, self.rank)
+        return [i for i, card in enumerate(self.cards)
+                if handeval.cardCode(card) in codes]
@@ -1,44 +1,678 @@
-from timeit import timeit
-#try: from numpy.random import shuffle
-#except ModuleNotFoundError:
 from pathlib import Path
 from sys import path
 path.append(str(Path().cwd().parent))
-from random import shuffle, sample
-from pokerlib.handparser import HandParser
+import random
+from sys import argv
+from array import array
+from bisect import bisect_left, bisect_right
+from math import comb, factorial, sqrt
+from statistics import NormalDist
+from contextlib import nullcontext
+from itertools import combinations, permutations, count, chain
+from concurrent.futures import ProcessPoolExecutor
+from pokerlib.handeval import CARDKEY, cardCode, codeCard, cardsKey, evaluateKey, \
+    batchKeys, evaluateBatchKeys, evaluateOmaha, TABLEDIR, loadTableFile
+from pokerlib.cardset import CardSet
+from pokerlib.lrucache import LRUCache
+from pokerlib.canonical import canonicalForm, parseRange, handClass, \
+    classCombos, HANDCLASSES, HANDCLASSINDEX
+
+def hasNumpy():
+    try: import numpy
+    except ModuleNotFoundError: return False
+    return True
+
+# number of nsim deals in which no foreign hand beats the hand,
+# dealt from a CardSet as card codes with the generator seeded by seed
+# and evaluated as sums of handeval keys shared by all hands
+def sampleWins(hand, table, nforeign, nsim, seed):
+    rng = random.Random(seed)
+    deck = CardSet(CardSet.FULL) - CardSet.fromCards(hand + table)
+    handkey = cardsKey(map(cardCode, hand))
+    tablekey = cardsKey(map(cardCode, table))
+
+    p = 0
+    n_table = 5 - len(table)
+    for _ in range(nsim):
+        dealt = deck.sample(n_table + 2 * nforeign, rng)
+        boardkey = tablekey + cardsKey(dealt[:n_table])
+        rank = evaluateKey(handkey + boardkey)
+        for i in range(n_table, len(dealt), 2):
+            foreign_rank = evaluateKey(
+                CARDKEY[dealt[i]] + CARDKEY[dealt[i+1]] + boardkey)
+            if foreign_rank > rank: break
+        else: p += 1
+
+    return p
+
+# the same as sampleWins, but all nsim deals are drawn at once as rows
+# of random permutations of the deck and evaluated with numpy,
+# the board keys are summed once and shared by all hands of a deal;
+# with depth > 0 the rows start with runout prefixes taken from the
+# strata as in sampleWinsStratified and the rest of the deck is permuted
+def sampleWinsBatch(hand, table, nforeign, nsim, seed, start=0, depth=0, runseed=None):
+    if nforeign == 0: return nsim
+    import numpy as np
+    rng = np.random.default_rng(random.Random(seed).getrandbits(128))
+    if depth:
+        hand, table, representatives, cumulative = runoutStrata(hand, table, depth)
+        offset = random.Random(runseed).random()
+        positions = (offset + np.arange(start, start + nsim) * GOLDEN) % 1 * cumulative[-1]
+        prefixes = np.array(representatives)[
+            np.searchsorted(cumulative, positions, side='right')]
+    else: prefixes = np.empty((nsim, 0), np.int64)
+    deck = np.array(list(CardSet(CardSet.FULL) - CardSet.fromCards(hand + table)))
+    n_table = 5 - len(table)
+
+    # prefix cards get keys above all random ones, so they sort last;
+    # only the ndealt lowest keys are selected and then sorted
+    ndealt = n_table - depth + 2 * nforeign
+    keys = rng.random((nsim, len(deck)))
+    keys[np.arange(nsim)[:, None], np.searchsorted(deck, prefixes)] = 2.
+    lowest = keys.argpartition(ndealt - 1, axis=1)[:, :ndealt]
+    order = np.take_along_axis(
+        lowest, np.take_along_axis(keys, lowest, 1).argsort(axis=1), 1)
+    dealt = np.concatenate([prefixes, deck[order]], axis=1)
+    tablekeys, tablebits = batchKeys([cardCode(card) for card in table])
+    boardkeys, boardbits = batchKeys(dealt[:, :n_table])
+    boardkeys, boardbits = boardkeys + tablekeys, boardbits + tablebits
+
+    handkeys, handbits = batchKeys([cardCode(card) for card in hand])
+    ranks = evaluateBatchKeys(boardkeys + handkeys, boardbits + handbits)
+
+    foreignkeys, foreignbits = batchKeys(dealt[:, n_table:].reshape(nsim, nforeign, 2))
+    foreign_ranks = evaluateBatchKeys(
+        (foreignkeys + boardkeys[:, None]).ravel(),
+        (foreignbits + boardbits[:, None]).ravel()
+    ).reshape(nsim, nforeign)
+    return int(np.count_nonzero(foreign_ranks.max(axis=1) <= ranks))
+
+# shares of the pot the hands (lists of hole card codes) win on average
+# over every runout of the table, with ties split, as seen by everyone
+# once the hands are shown (cards of folded hands are not known).
+# Holdem runouts are summed as keys shared by all hands and evaluated
+# with numpy if there are more than runoutlimit of them, omaha hands
+# (omaha=True) only if there are at most runoutlimit, else None is returned.
+# Two holdem hands before the flop are looked up in HEADSUPFILE if it
+# is built, and without numpy a seeded sample of runoutlimit runouts
+# stands in for the rest
+RUNOUTLIMIT = 2 * 10**4
+RUNOUTS = {}
+
+def runoutEquities(hands, table, omaha=False):
+    tablecodes = list(map(cardCode, table))
+    deck = list(CardSet(CardSet.FULL) - CardSet.fromCodes(
+        tablecodes + [code for hand in hands for code in hand]))
+    n_table = 5 - len(table)
+    nrunouts = comb(len(deck), n_table)
+    runouts = combinations(deck, n_table)
+    if nrunouts > RUNOUTLIMIT:
+        if omaha: return None
+        if len(hands) == 2 and not table:
+            try: equity = float(headsUpEquity(*[list(map(codeCard, hand)) for hand in hands]))
+            except FileNotFoundError: pass
+            else: return [equity, 1 - equity]
+        if hasNumpy(): return runoutEquitiesBatch(hands, tablecodes, deck)
+        rng = random.Random(str(hands))
+        nrunouts = RUNOUTLIMIT
+        runouts = (rng.sample(deck, n_table) for _ in range(nrunouts))
+
+    shares = [0.] * len(hands)
+    tablekey = cardsKey(tablecodes)
+    handkeys = [cardsKey(hand) for hand in hands]
+    for runout in runouts:
+        if omaha:
+            board = tablecodes + list(runout)
+            ranks = [evaluateOmaha(hand, board) for hand in hands]
+        else:
+            boardkey = tablekey + cardsKey(runout)
+            ranks = [evaluateKey(boardkey + key) for key in handkeys]
+        best = max(ranks)
+        winners = [i for i, rank in enumerate(ranks) if rank == best]
+        for i in winners: shares[i] += 1 / len(winners)
+
+    return [share / nrunouts for share in shares]
+
+# runouts are evaluated in chunks of those starting with the same card,
+# the rest of a chunk is a suffix of all combinations of one card less
+# in the deck (which are built once per deck size), so memory stays
+# bounded by comb(len(deck) - 1, n_table - 1) runouts
+def runoutEquitiesBatch(hands, tablecodes, deck):
+    import numpy as np
+    n_table = 5 - len(tablecodes)
+    key = (len(deck), n_table - 1)
+    if key not in RUNOUTS:
+        RUNOUTS[key] = np.fromiter(
+            chain.from_iterable(combinations(range(len(deck)), n_table - 1)),
+            np.int8, count = (n_table - 1) * comb(len(deck), n_table - 1)
+        ).reshape(-1, n_table - 1)
+    rests, deck = RUNOUTS[key], np.array(deck)
+    tablekeys, tablebits = batchKeys(tablecodes)
+    handkeys = [batchKeys(hand) for hand in hands]
+
+    shares = np.zeros(len(hands))
+    for first in range(len(deck) - n_table + 1):
+        # rests are sorted, so those after the first card are a suffix
+        start = len(rests) - comb(len(deck) - first - 1, n_table - 1)
+        boardkeys, boardbits = batchKeys(deck[rests[start:]])
+        firstkeys, firstbits = batchKeys([deck[first]])
+        boardkeys = boardkeys + tablekeys + firstkeys
+        boardbits = boardbits + tablebits + firstbits
+
+        ranks = np.empty((len(hands), len(boardkeys)), np.int64)
+        for i, (keys, bits) in enumerate(handkeys):
+            ranks[i] = evaluateBatchKeys(boardkeys + keys, boardbits + bits)
+        winners = ranks == ranks.max(axis=0)
+        shares += (winners / winners.sum(axis=0)).sum(axis=1)
+    return (shares / comb(len(deck), n_table)).tolist()
+
+# runout prefixes of depth cards grouped into strata of the same
+# canonical form (equal in equity, as they are suit permutations of
+# each other), as (representatives, cumulative numbers of prefixes),
+# kept for the most recently used situations (a flop's strata hold
+# about a thousand prefixes, so long running processes can't keep all)
+STRATA = LRUCache(256)
+
+def runoutStrata(hand, table, depth):
+    key = (canonicalForm(hand, table), depth)
+    strata = STRATA.get(key)
+    if strata is None:
+        hand, table = [list(card) for card in key[0][0]], [list(card) for card in key[0][1]]
+        deck = CardSet(CardSet.FULL) - CardSet.fromCards(hand + table)
+        forms = {}
+        for prefix in combinations(deck, depth):
+            form = canonicalForm(hand, table + [codeCard(code) for code in prefix])
+            if form in forms: forms[form][1] += 1
+            else: forms[form] = [prefix, 1]
+        representatives, cumulative, total = [], [], 0
+        for prefix, weight in forms.values():
+            total += weight
+            representatives.append(prefix)
+            cumulative.append(total)
+        strata = (hand, table, representatives, cumulative)
+        STRATA.put(key, strata)
+    return strata
+
+# the same as sampleWins, but the first depth runout cards are not
+# random, deal t of a run takes them from the stratum at offset + t * GOLDEN
+# (mod 1) of the cumulative numbers of prefixes, a low-discrepancy
+# sequence that spreads any number of deals over the strata evenly
+# and in proportion to their sizes, so their share of the variance is
+# mostly removed; the random offset is the same for all blocks of a run
+GOLDEN = (sqrt(5) - 1) / 2
+
+def sampleWinsStratified(hand, table, nforeign, nsim, seed, start, depth, runseed):
+    hand, table, representatives, cumulative = runoutStrata(hand, table, depth)
+    rng = random.Random(seed)
+    deck = CardSet(CardSet.FULL) - CardSet.fromCards(hand + table)
+    handkey = cardsKey(map(cardCode, hand))
+    tablekey = cardsKey(map(cardCode, table))
+    offset = random.Random(runseed).random()
+
+    p = 0
+    n_table = 5 - len(table) - depth
+    for t in range(start, start + nsim):
+        position = (offset + t * GOLDEN) % 1 * cumulative[-1]
+        prefix = representatives[bisect_right(cumulative, position)]
+        dealt = (deck - CardSet.fromCodes(prefix)).sample(n_table + 2 * nforeign, rng)
+        boardkey = tablekey + cardsKey(prefix) + cardsKey(dealt[:n_table])
+        rank = evaluateKey(handkey + boardkey)
+        for i in range(n_table, len(dealt), 2):
+            foreign_rank = evaluateKey(
+                CARDKEY[dealt[i]] + CARDKEY[dealt[i+1]] + boardkey)
+            if foreign_rank > rank: break
+        else: p += 1
+
+    return p
+
+# half-width of the Wilson score interval for wins out of n deals,
+# which unlike the normal interval does not vanish when all deals
+# are won or lost, z being the normal quantile of the confidence
+def wilsonHalfwidth(wins, n, z):
+    p = wins / n
+    return z / (1 + z*z / n) * sqrt(p * (1 - p) / n + z*z / (4 * n*n))
 
 class StatisticModel:
     __slots__ = ['hand', 'table']
-    __deck = [[i, j] for j in range(4) for i in range(13)]
+    # results of simulate for canonical forms of hand and table,
+    # so suit permutations of a situation are simulated only once,
+    # it can be replaced by a cache of another size or with a spill file
+    memo = LRUCache(10**5)
+    # situations with at most this many (runout, foreign hands)
+    # combinations are enumerated exactly instead of sampled
+    exactlimit = 5 * 10**4
+    # number of deals sampled with one seeded generator,
+    # in python and in numpy (which is used for nsim >= batchlimit)
+    blocksize = 1000
+    batchsize = 2**14
+    batchlimit = 10**4
+    # runout prefixes enumerated for stratified sampling
+    stratalimit = 2 * 10**4
 
     def __init__(self, hand, table=[]):
         self.hand = hand
         self.table = table
 
-    def simulate(self, nforeign, nsim):
-        deck = self.__deck.copy()
-        for card in self.hand + self.table: deck.remove(card)
+    # probability that no foreign hand beats the hand (ties count as wins),
+    # the same seed gives the same result for any number of workers;
+    # vectorized defaults to numpy sampling if nsim is large enough,
+    # stratified samples the runouts by strata (in either of them).
+    # If precision is given, sampling stops as soon as the confidence
+    # interval's half-width is at most precision (nsim is then the most
+    # deals sampled) and the estimate is returned with the half-width
+    def simulate(self, nforeign, nsim, seed=None, workers=1, vectorized=None,
+                 precision=None, confidence=0.95, stratified=False):
+        self.checkForeign(nforeign)
+        exact = self.ncombinations(nforeign) <= StatisticModel.exactlimit
+        if vectorized is None:
+            vectorized = nsim >= StatisticModel.batchlimit and hasNumpy()
+        hand, table = canonicalForm(self.hand, self.table)
+        key = (hand, table, nforeign, precision is None,
+               None if exact else (precision, confidence, nsim, seed,
+                                   vectorized, stratified))
+        result = StatisticModel.memo.get(key)
+        if result is None:
+            if exact:
+                result = self.exact(nforeign)
+                if precision is not None: result = (result, 0.)
+            elif precision is None: result = self.estimate(
+                nforeign, nsim, seed, workers, vectorized, stratified)
+            else: result = self.estimateUntil(
+                nforeign, nsim, precision, confidence, seed, workers,
+                vectorized, stratified)
+            StatisticModel.memo.put(key, result)
+        return result
+
+    # number of runouts times the sets of nforeign disjoint hands
+    # that can be dealt from the rest of the deck
+    def ncombinations(self, nforeign):
+        ncards = 52 - len(self.hand) - len(self.table)
+        n_table = 5 - len(self.table)
+        rest = ncards - n_table
+        if rest < 2 * nforeign: return 0
+        return comb(ncards, n_table) * factorial(rest) // (
+            factorial(rest - 2 * nforeign) *
+            2 ** nforeign * factorial(nforeign)
+        )
+
+    # nforeign hands have to be dealt from the deck left after the runout
+    # (ncombinations is 0 if they don't fit, which isn't an exact spot)
+    def checkForeign(self, nforeign):
+        if nforeign < 0 or self.ncombinations(nforeign) == 0:
+            raise ValueError(f"{nforeign} foreign hands can not be dealt "
+                             f"with {len(self.table)} cards on the table")
+
+    # the most runout cards that are stratified, there being
+    # at most stratalimit prefixes of them (before grouping)
+    def stratumDepth(self):
+        ncards = 52 - len(self.hand) - len(self.table)
+        depth = 0
+        while depth < 5 - len(self.table) and \
+        comb(ncards, depth + 1) <= StatisticModel.stratalimit: depth += 1
+        return depth
+
+    # nsim (None for no end) is split into blocks of blocksize deals,
+    # each sampled with a generator seeded by seed and the block's index,
+    # so the result does not depend on how the blocks are spread over
+    # worker processes; returns the sampler and its arguments per block
+    def blocks(self, nforeign, nsim, seed, vectorized=False,
+               stratified=False, blocksize=None):
+        self.checkForeign(nforeign)
+        if vectorized: sampler = sampleWinsBatch
+        else: sampler = sampleWinsStratified if stratified else sampleWins
+        if stratified: depth = self.stratumDepth()
+        if blocksize is None: blocksize = StatisticModel.batchsize \
+            if sampler is sampleWinsBatch else StatisticModel.blocksize
+        starts = count(0, blocksize) if nsim is None else range(0, nsim, blocksize)
+        return sampler, (
+            (self.hand, self.table, nforeign,
+             blocksize if nsim is None else min(blocksize, nsim - start),
+             f'{seed}-{i}') + ((start, depth, seed) if stratified else ())
+            for i, start in enumerate(starts)
+        )
+
+    def estimate(self, nforeign, nsim, seed=None, workers=1, vectorized=False,
+                 stratified=False):
+        if seed is None: seed = random.getrandbits(64)
+        sampler, blocks = self.blocks(nforeign, nsim, seed, vectorized, stratified)
+        blocks = list(blocks)
+
+        if workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                wins = sum(pool.map(
+                    sampler, *zip(*blocks),
+                    chunksize = -(-len(blocks) // (4 * workers))
+                ))
+        else: wins = sum(sampler(*block) for block in blocks)
+
+        return wins / nsim
+
+    # samples the blocks in rounds of one block per worker and stops
+    # at the first block (in order) after which the interval is narrow
+    # enough, so the result again does not depend on the workers
+    def estimateUntil(self, nforeign, nsim, precision, confidence=0.95,
+                      seed=None, workers=1, vectorized=False, stratified=False):
+        if seed is None: seed = random.getrandbits(64)
+        sampler, blocks = self.blocks(nforeign, nsim, seed, vectorized, stratified)
+        blocks = list(blocks)
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        wins = n = 0
+        with ProcessPoolExecutor(workers) if workers > 1 else nullcontext() as pool:
+            for start in range(0, len(blocks), workers):
+                chunk = blocks[start:start+workers]
+                results = (pool.map if pool else map)(sampler, *zip(*chunk))
+                for block, block_wins in zip(chunk, results):
+                    wins, n = wins + block_wins, n + block[3]
+                    halfwidth = wilsonHalfwidth(wins, n, z)
+                    if halfwidth <= precision: return wins / n, halfwidth
+
+        return wins / n, halfwidth
+
+    # yields (estimate, deals sampled, half-width) after every block
+    # of every deals, until nsim deals are sampled (or for as long as
+    # it is iterated if nsim is None), so a consumer can take the first
+    # estimate that is good enough and close the generator; with the
+    # default block size the estimate after n deals equals estimate's
+    def stream(self, nforeign, nsim=None, every=None, seed=None,
+               vectorized=False, confidence=0.95, stratified=False):
+        if seed is None: seed = random.getrandbits(64)
+        sampler, blocks = self.blocks(
+            nforeign, nsim, seed, vectorized, stratified, every)
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        wins = n = 0
+        for block in blocks:
+            wins, n = wins + sampler(*block), n + block[3]
+            yield wins / n, n, wilsonHalfwidth(wins, n, z)
+
+    # enumerates every runout and, for each, counts the sets of
+    # nforeign disjoint hands from the rest of the deck that don't beat
+    # the hand, with every pair of cards evaluated once per runout
+    def exact(self, nforeign):
+        self.checkForeign(nforeign)
+        deck = list(CardSet(CardSet.FULL) - CardSet.fromCards(self.hand + self.table))
+        handkey = cardsKey(map(cardCode, self.hand))
+        tablekey = cardsKey(map(cardCode, self.table))
+
+        wins = 0
+        for board in combinations(deck, 5 - len(self.table)):
+            boardkey = tablekey + cardsKey(board)
+            rank = evaluateKey(handkey + boardkey)
+            rest = [code for code in deck if code not in board]
+            allowed = [[False] * len(rest) for _ in rest]
+            for i, j in combinations(range(len(rest)), 2):
+                allowed[i][j] = evaluateKey(
+                    CARDKEY[rest[i]] + CARDKEY[rest[j]] + boardkey) <= rank
+            wins += self.countHands(allowed, list(range(len(rest))), nforeign)
+
+        return wins / self.ncombinations(nforeign)
+
+    # number of sets of nforeign disjoint allowed pairs within free
+    @classmethod
+    def countHands(cls, allowed, free, nforeign):
+        if nforeign == 0: return 1
+        if len(free) < 2 * nforeign: return 0
+        first, rest = free[0], free[1:]
+        count = cls.countHands(allowed, rest, nforeign) # first is not dealt
+        for i, other in enumerate(rest):
+            if allowed[first][other]:
+                count += cls.countHands(allowed, rest[:i] + rest[i+1:], nforeign - 1)
+        return count
+
+# equities of hand ranges against each other, ranges are given as text
+# (see canonical.parseRange) or as dictionaries of hands and weights.
+# Hands that share cards with the table or with each other are never
+# dealt together, and every board is evaluated once per distinct hand
+class RangeModel:
+    __slots__ = ['ranges', 'table']
+    # all runouts are enumerated if there are at most this many of them,
+    # otherwise nsim boards are sampled
+    boardlimit = 2000
+    # for more than two ranges, the number of deals sampled per board
+    dealsperboard = 16
+
+    def __init__(self, ranges, table=[]):
+        self.ranges = [parseRange(r) if isinstance(r, str) else dict(r)
+                       for r in ranges]
+        self.table = table
+
+    # shares of the pot each range wins on average (ties are split)
+    def simulate(self, nsim, seed=None):
+        rng = random.Random(seed)
+        tablecards = CardSet.fromCards(self.table)
+        live = [[(combo, weight) for combo, weight in r.items()
+                 if weight > 0 and not tablecards & CardSet.fromCodes(combo)]
+                for r in self.ranges]
+        if len(live) < 2 or not all(live):
+            raise ValueError("equity needs at least two ranges possible with the table")
 
-        p = 0
+        deck = list(CardSet(CardSet.FULL) - tablecards)
         n_table = 5 - len(self.table)
-        for _ in range(nsim):
-            shuffle(deck)
-            deckit = iter(deck)
-            mutualc = self.table + [next(deckit) for _ in range(n_table)]
-            parsed_hand = HandParser(self.hand + mutualc)
-            parsed_hand.parse()
-            for _ in range(nforeign):
-                foreign_hand = [next(deckit) for _ in range(2)] + mutualc
-                foreign_hand = HandParser(foreign_hand)
-                foreign_hand.parse()
-                if foreign_hand > parsed_hand: break
-            else: p += 1
-
-        return p / nsim
+        if comb(len(deck), n_table) <= RangeModel.boardlimit:
+            boards = combinations(deck, n_table)
+        else: boards = (rng.sample(deck, n_table) for _ in range(nsim))
+
+        tablekey = cardsKey(map(cardCode, self.table))
+        shares, total = [0.] * len(live), 0.
+        for board in boards:
+            boardcards = CardSet.fromCodes(board)
+            boardkey = tablekey + cardsKey(board)
+            board_live = [[(combo, weight) for combo, weight in r
+                           if not boardcards & CardSet.fromCodes(combo)]
+                          for r in live]
+            if not all(board_live): continue
+            ranks = {}
+            for r in board_live:
+                for combo, _ in r:
+                    if combo not in ranks: ranks[combo] = evaluateKey(
+                        CARDKEY[combo[0]] + CARDKEY[combo[1]] + boardkey)
+            if len(live) == 2:
+                total += self.headsUp(board_live, ranks, shares)
+            else: total += self.multiway(board_live, ranks, shares, rng)
+
+        if total == 0: raise ValueError("ranges can not be dealt together")
+        return [share / total for share in shares]
+
+    # adds weighted wins of both ranges over all pairs of disjoint hands,
+    # from prefix sums of the second range's weights sorted by rank,
+    # corrected by the hands of the second range that share a card
+    # with the first range's hand
+    @staticmethod
+    def headsUp(board_live, ranks, shares):
+        hero, villain = board_live
+        villain = sorted((ranks[combo], weight, combo) for combo, weight in villain)
+        vranks = [rank for rank, _, _ in villain]
+        prefix = [0.]
+        for _, weight, _ in villain: prefix.append(prefix[-1] + weight)
+        bycard = {}
+        for item in villain:
+            for code in item[2]: bycard.setdefault(code, []).append(item)
+
+        total = 0.
+        for combo, weight in hero:
+            rank = ranks[combo]
+            lo, hi = bisect_left(vranks, rank), bisect_right(vranks, rank)
+            below, equal, alive = prefix[lo], prefix[hi] - prefix[lo], prefix[-1]
+            first, second = combo
+            conflicts = bycard.get(first, []) + [
+                item for item in bycard.get(second, []) if first not in item[2]]
+            for vrank, vweight, _ in conflicts:
+                alive -= vweight
+                if vrank < rank: below -= vweight
+                elif vrank == rank: equal -= vweight
+            shares[0] += weight * (below + equal / 2)
+            shares[1] += weight * (alive - below - equal / 2)
+            total += weight * alive
+        return total
+
+    # samples deals of one hand per range (by weight, among the hands
+    # possible with the board) and adds the pot shares of those without
+    # shared cards, each board weighted by the product of its ranges'
+    # live weights so the deals follow the weights of the full ranges
+    @classmethod
+    def multiway(cls, board_live, ranks, shares, rng):
+        choices, boardweight = [], 1.
+        for r in board_live:
+            combos, cumulative, acc = [], [], 0.
+            for combo, weight in r:
+                acc += weight
+                combos.append(combo)
+                cumulative.append(acc)
+            choices.append((combos, cumulative))
+            boardweight *= acc
+
+        total = 0.
+        for _ in range(cls.dealsperboard):
+            deal = [rng.choices(combos, cum_weights=cumulative)[0]
+                    for combos, cumulative in choices]
+            dealt = CardSet.fromCodes(code for combo in deal for code in combo)
+            if len(dealt) < 2 * len(deal): continue
+            dealranks = [ranks[combo] for combo in deal]
+            best = max(dealranks)
+            winners = [i for i, rank in enumerate(dealranks) if rank == best]
+            for i in winners: shares[i] += boardweight / len(winners)
+            total += boardweight
+        return total
+
+# equities of the 169 preflop classes against 1 to MAXFOREIGN random
+# opponents, as StatisticModel defines them, are estimated once to the
+# precision below and stored in PREFLOPFILE, a table file like handeval's,
+# at index HANDCLASSINDEX[class] * MAXFOREIGN + nforeign - 1.
+# The file is committed next to this module (it takes minutes to build,
+# with python handstats.py preflop) and has a version of its own, which
+# started at handeval's version when it was first written
+PREFLOPVERSION = 2
+PREFLOPFILE = Path(__file__).parent / f'preflop{PREFLOPVERSION}.tables'
+PREFLOPPRECISION = 0.002
+MAXFOREIGN = 8
+PREFLOP = None
+
+def buildPreflopTable(precision=PREFLOPPRECISION, seed=0, workers=1):
+    table = array('f')
+    for name in HANDCLASSES:
+        model = StatisticModel([codeCard(code) for code in classCombos(name)[0]])
+        for nforeign in range(1, MAXFOREIGN + 1):
+            equity, _ = model.estimateUntil(
+                nforeign, 10**7, precision, seed=f'{seed}-{name}-{nforeign}',
+                workers=workers, vectorized=hasNumpy())
+            table.append(equity)
+    return [table]
+
+def loadPreflopTable():
+    global PREFLOP
+    try: PREFLOP, = loadTableFile(PREFLOPFILE, ['f'], version=PREFLOPVERSION)
+    except FileNotFoundError as error:
+        raise FileNotFoundError(
+            f'{error}, it is built by python handstats.py preflop') from None
+
+def preflopEquity(hand, nforeign):
+    if not 1 <= nforeign <= MAXFOREIGN:
+        raise ValueError(f'preflop equities are stored for 1 to {MAXFOREIGN} opponents')
+    if PREFLOP is None: loadPreflopTable()
+    return PREFLOP[HANDCLASSINDEX[handClass(hand)] * MAXFOREIGN + nforeign - 1]
+
+# heads-up all-in equities (ties count half) of every pair of hole
+# cards, stored in HEADSUPFILE as a float32 NCOMBOS x NCOMBOS matrix
+# indexed by comboIndex, NaN where the two hands share a card.
+# Matchups that are suit permutations of each other have the same
+# equity, so only a representative of each preflop class is compared
+# with every hand, on the same nboards random boards, the counts are
+# pooled over equivalent (and reversed) matchups and the other rows
+# are filled in by permuting the suits. Building it takes minutes,
+# so it is only done by python handstats.py headsup (once per TABLEDIR,
+# not by concurrent workers that look equities up), its version started
+# at handeval's version like the preflop table's
+HEADSUPVERSION = 2
+HEADSUPFILE = TABLEDIR / f'headsup{HEADSUPVERSION}.tables'
+HEADSUPBOARDS = 10**5
+NCOMBOS = 1326
+HEADSUP = None
+
+# index of two hole cards among combinations(range(52), 2) of card codes
+def comboIndex(hand):
+    low, high = sorted(map(cardCode, hand))
+    return low * (103 - low) // 2 + high - low - 1
+
+def buildHeadsUpTable(nboards=HEADSUPBOARDS, seed=0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    combos = list(combinations(range(52), 2))
+    hands = [[codeCard(low), codeCard(high)] for low, high in combos]
+    keys, bits = batchKeys(np.array(combos))
+    masks = np.array([1 << low | 1 << high for low, high in combos])
+    reps = [comboIndex(map(codeCard, classCombos(name)[0])) for name in HANDCLASSES]
+
+    score = np.zeros((len(reps), NCOMBOS), np.int32) # 2 per win, 1 per tie
+    count = np.zeros((len(reps), NCOMBOS), np.int32)
+    for board in np.argsort(rng.random((nboards, 52)), axis=1)[:, :5]:
+        boardkey, boardbits = batchKeys(board)
+        alive = masks & int(CardSet.fromCodes(board.tolist())) == 0
+        ranks = np.full(NCOMBOS, -1, np.int64)
+        ranks[alive] = evaluateBatchKeys(keys[alive] + boardkey, bits[alive] + boardbits)
+        pairs = alive[reps, None] & alive[None, :]
+        score += pairs & (ranks[reps, None] > ranks[None, :])
+        score += pairs & (ranks[reps, None] >= ranks[None, :])
+        count += pairs
+
+    classes = {}
+    ids = np.full((2, len(reps), NCOMBOS), -1, np.int64)
+    for row, i in enumerate(reps):
+        for j in range(NCOMBOS):
+            if masks[i] & masks[j]: continue
+            ids[0, row, j] = classes.setdefault(
+                canonicalForm(hands[i], hands[j]), len(classes))
+            ids[1, row, j] = classes.setdefault(
+                canonicalForm(hands[j], hands[i]), len(classes))
+    valid = ids[0] >= 0
+    forward, reverse = ids[0][valid], ids[1][valid]
+    score, count = score[valid], count[valid]
+    wins = np.bincount(forward, score, len(classes)) + \
+        np.bincount(reverse, 2 * count - score, len(classes))
+    deals = np.bincount(forward, count, len(classes)) + \
+        np.bincount(reverse, count, len(classes))
+    values = np.full((len(reps), NCOMBOS), np.nan, np.float32)
+    values[valid] = (wins / (2 * deals))[forward]
+
+    matrix = np.full((NCOMBOS, NCOMBOS), np.nan, np.float32)
+    for suits in permutations(range(4)):
+        moved = np.array([comboIndex(
+            codeCard(suits[code // 13] * 13 + code % 13) for code in combo)
+            for combo in combos])
+        matrix[moved[reps, None], moved[None, :]] = values
+    return [matrix.ravel()]
+
+def loadHeadsUpTable():
+    global HEADSUP
+    try: HEADSUP, = loadTableFile(HEADSUPFILE, ['f'], version=HEADSUPVERSION)
+    except FileNotFoundError as error:
+        raise FileNotFoundError(
+            f'{error}, it is built by python handstats.py headsup') from None
+
+# equity of hand against other, both given as two [value, suit] cards
+def headsUpEquity(hand, other):
+    if HEADSUP is None: loadHeadsUpTable()
+    return HEADSUP[comboIndex(hand) * NCOMBOS + comboIndex(other)]
+
+# the whole matrix as a numpy array sharing the memory-mapped file,
+# so processes that use it share one copy of it in the page cache
+def headsUpMatrix():
+    import numpy as np
+    if HEADSUP is None: loadHeadsUpTable()
+    return np.frombuffer(HEADSUP, np.float32).reshape(NCOMBOS, NCOMBOS)
 
 if __name__ == '__main__':
-    deck = [[i, j]  for j in range(4) for i in range(13)]
-    nforeign, nsim = 5, 10**3
-    hand = [[12, 0], [12, 1]]
-    model = StatisticModel(hand)
-    print(timeit(lambda: print(model.simulate(nforeign, nsim)), number=1))
+    # python handstats.py preflop [workers] (re)builds the preflop table
+    # and python handstats.py headsup the heads-up matrix,
+    # timing is done by tests/benchmarks.py
+    if argv[1:2] == ['headsup']:
+        HEADSUPFILE.unlink(missing_ok=True)
+        HEADSUP, = loadTableFile(HEADSUPFILE, ['f'], buildHeadsUpTable, HEADSUPVERSION)
+        print(HEADSUPFILE)
+    elif argv[1:2] == ['preflop']:
+        workers = int(argv[2]) if len(argv) > 2 else 1
+        PREFLOPFILE.unlink(missing_ok=True)
+        PREFLOP, = loadTableFile(PREFLOPFILE, ['f'],
+                                 lambda: buildPreflopTable(workers=workers),
+                                 PREFLOPVERSION)
+        print(PREFLOPFILE)
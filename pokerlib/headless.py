@@ -0,0 +1,69 @@
+import random
+from time import perf_counter
+from pokerlib.game import PlayerGroup, Player, PokerGame
+from pokerlib.handparser import HandParser
+
+# A policy is a function of the round and the player to act, returning
+# an action as Round.process_action accepts it ('call', 'check', 'fold',
+# 'all in' or 'raise X'), invalid actions are played as a fold.
+
+def callingStation(round, player):
+    return 'call'
+
+def randomPolicy(rng=random, actions=('call', 'call', 'check', 'fold', 'raise 40')):
+    return lambda round, player: rng.choice(actions)
+
+# PokerGame without IO (public_out and private_out are never called),
+# where every player's actions come from its policy. Players are named
+# by the keys of policies and every one of them starts with money.
+# All-in equities are not evaluated even if a subclass adds IO
+class HeadlessGame(PokerGame):
+    all_in_equities = False
+
+    def __init__(self, policies: dict, money: int, big_blind: int, hand_parser=HandParser):
+        self.policies = policies
+        self.money = money
+        self.seated = []
+        super().__init__(self.seat(), big_blind, hand_parser)
+
+    def seat(self):
+        self.seated = [Player(name, self.money) for name in self.policies]
+        return PlayerGroup(self.seated)
+
+    # plays about nrounds rounds (rounds that end while being dealt can
+    # add a few), seating everyone again with money whenever fewer than
+    # two players are left, and returns the chips every player won and
+    # the number of rounds played per second; seed seeds the game's rng
+    # the cards are dealt with (policies draw from their own generators)
+    def play(self, nrounds, seed=None):
+        if seed is not None: self.rng.seed(seed)
+        won = dict.fromkeys(self.policies, 0)
+        start, first = perf_counter(), self.rounds_played
+
+        while self.rounds_played - first < nrounds:
+            if not self.is_ok():
+                for player in self.seated: won[player.name] += player.money - self.money
+                self.players = self.seat()
+                self.button = self.players[0]
+            self.new_round()
+            while self.round:
+                round = self.round
+                if self.rounds_played - first >= nrounds: round.exit_after_this = True
+                player = round.current_player
+                action = self.policies[player.name](round, player)
+                if not round.process_action(action): round.process_action('fold')
+
+        for player in self.seated: won[player.name] += player.money - self.money
+        seconds = perf_counter() - start
+        rounds = self.rounds_played - first
+        return {
+            'rounds': rounds, 'seconds': seconds,
+            'rounds_per_sec': rounds / seconds, 'won': won
+        }
+
+# python -m pokerlib.headless
+if __name__ == '__main__':
+    rng = random.Random(0)
+    policies = {f'Random{i}': randomPolicy(rng) for i in range(5)}
+    policies['Caller'] = callingStation
+    print(HeadlessGame(policies, 1000, 20).play(10**4, seed=0))
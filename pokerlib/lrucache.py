@@ -0,0 +1,71 @@
+import shelve
+from collections import OrderedDict
+
+# Dictionary-like cache that keeps at most maxsize entries in memory,
+# dropping the least recently used one when full. If spill is a path,
+# dropped entries are written to a shelve there instead and found again
+# on a later miss (so they outlive the process), keys are then stored
+# by their repr, so they have to be built of plain values.
+# Counters of hits, misses and evictions can be read to size it.
+class LRUCache:
+
+    def __init__(self, maxsize, spill=None):
+        self.maxsize = maxsize
+        self.spill = spill
+        self.entries = OrderedDict()
+        self.disk = None
+        self.hits = self.diskhits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries or \
+            self.spill is not None and repr(key) in self.openDisk()
+
+    def openDisk(self):
+        if self.disk is None: self.disk = shelve.open(str(self.spill))
+        return self.disk
+
+    # returns default on a miss, a spilled entry is moved back to memory
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.spill is not None:
+            value = self.openDisk().get(repr(key), default)
+            if value is not default:
+                self.diskhits += 1
+                self.put(key, value)
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            old, oldvalue = self.entries.popitem(last=False)
+            self.evictions += 1
+            if self.spill is not None: self.openDisk()[repr(old)] = oldvalue
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.diskhits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self.entries), 'maxsize': self.maxsize,
+            'hits': self.hits, 'diskhits': self.diskhits,
+            'misses': self.misses, 'evictions': self.evictions
+        }
+
+    # writes the entries in memory to the spill file as well,
+    # so the next process finds all of them, the cache stays usable
+    def close(self):
+        if self.spill is None: return
+        disk = self.openDisk()
+        for key, value in self.entries.items(): disk[repr(key)] = value
+        disk.close()
+        self.disk = None
@@ -0,0 +1,126 @@
+from sys import path, version
+from pathlib import Path
+path.append(str(Path().cwd().parent))
+import json
+import random
+from argparse import ArgumentParser
+from time import perf_counter
+from statistics import quantiles
+from pokerlib.handparser import HandParser
+from pokerlib.handstats import StatisticModel, hasNumpy
+from pokerlib.enums import Value, Suit, Hand
+
+CARDS = [[val, suit] for val in Value for suit in Suit]
+BASELINE = Path(__file__).parent / 'benchmark_baseline.json'
+# a case is reported as a regression if it is this much slower than baseline
+TOLERANCE = 0.15
+
+# runs fn on every item, timing batches of batch items, and returns
+# operations per second with per-operation percentiles in microseconds
+def measure(fn, items, batch=100, repeat=5):
+    times = []
+    for _ in range(repeat):
+        for i in range(0, len(items), batch):
+            chunk = items[i:i+batch]
+            start = perf_counter()
+            for item in chunk: fn(item)
+            times.append((perf_counter() - start) / len(chunk))
+    p50, p90, p99 = [quantiles(times, n=100)[i] for i in (49, 89, 98)]
+    return {
+        'ops_per_sec': round(1 / (sum(times) / len(times))),
+        'p50_us': round(p50 * 1e6, 3),
+        'p90_us': round(p90 * 1e6, 3),
+        'p99_us': round(p99 * 1e6, 3),
+        'ops': len(items) * repeat
+    }
+
+def parsed(cards):
+    hand = HandParser(list(cards))
+    hand.parse()
+    return hand
+
+# n random 7 card hands of every category, straight flushes are built
+# as they are too rare to be sampled
+def categoryHands(rng, n):
+    hands = {handenum: [] for handenum in Hand}
+    while any(len(hands[handenum]) < n for handenum in Hand
+              if handenum != Hand.STRAIGHTFLUSH):
+        cards = rng.sample(CARDS, 7)
+        hand = parsed(cards)
+        if len(hands[hand.handenum]) < n: hands[hand.handenum].append(cards)
+    while len(hands[Hand.STRAIGHTFLUSH]) < n:
+        suit, top = rng.randrange(4), rng.randrange(3, 13)
+        cards = [[(top - i) % 13, suit] for i in range(5)]
+        cards += rng.sample([card for card in CARDS if card not in cards], 2)
+        hands[Hand.STRAIGHTFLUSH].append(cards)
+    return hands
+
+def simulateOnce(args):
+    StatisticModel.memo.clear()
+    hand, table, nforeign, nsim, seed = args
+    return StatisticModel(hand, table).simulate(nforeign, nsim, seed, vectorized=False)
+
+def run(seed=0, n=2000):
+    rng = random.Random(seed)
+    deals = [rng.sample(CARDS, 7) for _ in range(n)]
+    results = {}
+
+    results['construct'] = measure(HandParser, deals)
+    results['parse'] = measure(lambda cards: HandParser(cards).parse(), deals)
+    results['addCards'] = measure(
+        lambda cards: HandParser(cards[:2]).addCards(cards[2:]), deals)
+    for handenum, hands in categoryHands(rng, n // 10).items():
+        results[f'parse {handenum.name}'] = measure(
+            lambda cards: HandParser(cards).parse(), hands)
+
+    hands = [parsed(cards) for cards in deals]
+    pairs = list(zip(hands, reversed(hands)))
+    results['compare'] = measure(lambda pair: pair[0] < pair[1], pairs)
+    # groups of four hands sharing a board, as at a showdown
+    groups = []
+    for _ in range(n // 10):
+        board = rng.sample(CARDS, 13)
+        groups.append([parsed(board[i:i+2] + board[8:]) for i in range(0, 8, 2)])
+    results['getGroupKickers'] = measure(HandParser.getGroupKickers, groups, batch=10)
+
+    situations = [
+        (rng.sample(CARDS, 2), [], 3, 1000, seed),
+        (*(lambda cards: (cards[:2], cards[2:]))(rng.sample(CARDS, 5)), 2, 1000, seed)
+    ]
+    results['simulate'] = measure(simulateOnce, situations * 2, batch=1, repeat=2)
+    return results
+
+def compare(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline: continue
+        ratio = result['ops_per_sec'] / baseline[name]['ops_per_sec']
+        flag = ''
+        if ratio < 1 - TOLERANCE:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:28} {result["ops_per_sec"]:>10} ops/s  '
+              f'{ratio:6.2f}x baseline{flag}')
+    return regressions
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='hand evaluation benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='file the results are written to as json')
+    parser.add_argument('--baseline', default=str(BASELINE))
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run(args.seed)
+    report = {'python': version.split()[0], 'numpy': hasNumpy(),
+              'seed': args.seed, 'results': results}
+    if args.out:
+        with open(args.out, 'w') as file: json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file: json.dump(report, file, indent=2)
+    elif Path(args.baseline).exists():
+        with open(args.baseline) as file: baseline = json.load(file)['results']
+        regressions = compare(results, baseline)
+        if regressions: exit(1)
+    else: print(json.dumps(report, indent=2))
@@ -1,8 +1,8 @@
 from sys import path
 from pathlib import Path
 path.append(str(Path().cwd().parent))
-from random import sample
-from timeit import timeit
+from random import sample, Random
+from hashlib import sha256
 from pokerlib.handparser import *
 from pokerlib.enums import Value, Suit
 
@@ -19,11 +19,28 @@ def randomHandTests():
         print(hand.handbase)
         input()
 
-def timeParser(n):
-    a = timeit(lambda: HandParser(sample(CARDS, 7)).parse(),
-               number=n)
-    b = timeit(lambda: sample(CARDS, 7), number=n)
-    print(a - b)
-    
+# digests of categories, hand values and order (against the previous
+# hand) of nhands seeded random hands per number of cards, as the parser
+# written before handeval gave them, so a change of the evaluator or
+# its tables (and TABLEVERSION) can't change how hands are ranked
+PARSERDIGESTS = {
+    2: '2f49338f3a1587b5', 3: '74d7f3ecbbbda5c1', 4: 'ad2bce3f0458e568',
+    5: 'cb140862cb21a42f', 6: '1b77f3174c3041ae', 7: 'fad08e3b941db073'
+}
+
+def parserRegressionTest(nhands=10**4, seed=0):
+    rng = Random(seed)
+    for ncards, digest in PARSERDIGESTS.items():
+        sha, previous = sha256(), None
+        for _ in range(nhands):
+            hand = HandParser(rng.sample(CARDS, ncards))
+            values = [int(val) for val, _ in hand.handfullcards]
+            order = 0 if previous is None else (hand > previous) - (hand < previous)
+            sha.update(repr((int(hand.handenum), values, order)).encode())
+            previous = hand
+        assert sha.hexdigest()[:16] == digest, f'{ncards} card hands changed'
+
+# timing is done by benchmarks.py
 if __name__ == '__main__':
-    timeParser(10**5)
+    parserRegressionTest()
+    randomHandTests()
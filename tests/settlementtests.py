@@ -0,0 +1,67 @@
+from pathlib import Path
+from sys import path
+path.append(str(Path().cwd().parent))
+import random
+from pokerlib.enums import Value, Suit
+from pokerlib.handparser import HandParser
+from pokerlib.game import PlayerGroup, Player, PokerGame
+from pokerlib.headless import HeadlessGame, randomPolicy
+
+ACTIONS = ('call', 'call', 'check', 'fold', 'raise 40', 'raise 300', 'all in')
+
+# seeded games with random stacks, all ins and folds, where the
+# chips on the table have to be the same after every round (players
+# are seated again with new stacks whenever the game breaks up)
+def chipConservationTests(ngames=20, nrounds=500):
+    for seed in range(ngames):
+        rng = random.Random(seed)
+        policies = {f'P{i}': randomPolicy(rng, ACTIONS) for i in range(rng.randint(2, 9))}
+        game = HeadlessGame(policies, 1000, 20)
+        game.rng.seed(seed)
+
+        while game.rounds_played < nrounds:
+            if game.rounds_played == 0 or not game.is_ok():
+                game.players = game.seat()
+                game.button = game.players[0]
+                for player in game.players: player.money = rng.randrange(50, 3000)
+                total = sum(player.money for player in game.players)
+            game.new_round()
+            while game.round:
+                round = game.round
+                round.exit_after_this = True
+                action = policies[round.current_player.name](round, round.current_player)
+                if not round.process_action(action): round.process_action('fold')
+            assert sum(player.money for player in game.seated) == total, \
+                f'seed {seed}, round {game.rounds_played}: chips changed'
+
+# four players, the small blind folds and the other three split the
+# pot of 77 on a royal flush board, so the two odd chips go to the
+# first two winners from the small blind on (big blind first)
+def oddChipTest():
+    players = PlayerGroup([Player(f'P{i}', 1000) for i in range(4)])
+    game = PokerGame(players, 22)
+    game.new_round()
+    round = game.round
+    round.exit_after_this = True
+    assert round.button.name == 'P1' # big blind, P0 posted the small blind
+
+    holes = [[[Value.TWO, Suit.CLUB], [Value.THREE, Suit.DIAMOND]],
+             [[Value.FOUR, Suit.CLUB], [Value.FIVE, Suit.DIAMOND]],
+             [[Value.SIX, Suit.CLUB], [Value.SEVEN, Suit.DIAMOND]],
+             [[Value.EIGHT, Suit.CLUB], [Value.NINE, Suit.DIAMOND]]]
+    for player, cards in zip(round.players, holes):
+        player.cards = tuple(cards)
+        player.hand = HandParser(list(cards))
+    round.deck = iter([[value, Suit.SPADE] for value in
+                       (Value.TEN, Value.JACK, Value.QUEEN, Value.KING, Value.ACE)])
+
+    for action in ['call', 'call', 'fold', 'check'] + ['check'] * 9:
+        if not game.round: break
+        assert round.process_action(action), action
+    assert game.round is None
+    assert [player.money for player in players] == [989, 1004, 1004, 1003]
+
+if __name__ == '__main__':
+    oddChipTest()
+    chipConservationTests()
+    print('ok')